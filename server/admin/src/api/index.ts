@@ -56,7 +56,9 @@ export const tagsApi = {
 }
 
 export const commentsApi = {
-    getAll: (approved?: boolean) => api.get('/api/admin/comments', { params: { approved } }),
+    // 按时间倒序分页，下一页游标在 X-Next-Cursor 响应头中
+    getAll: (approved?: boolean, cursor?: string) =>
+        api.get('/api/admin/comments', { params: { approved, cursor } }),
     approve: (id: number) => api.put(`/api/admin/comments/${id}/approve`),
     delete: (id: number) => api.delete(`/api/admin/comments/${id}`)
 }
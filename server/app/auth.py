@@ -1,10 +1,14 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select
+from sqlalchemy import event, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import get_settings
 from app.database import get_db
@@ -27,6 +31,30 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# bcrypt 每次计算约几百毫秒 CPU，放到专用线程池中执行（bcrypt 计算时释放 GIL），
+# 并限制排队数量，登录请求再多也不会占满事件循环和默认线程池
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"
+)
+_password_slots = asyncio.Semaphore(settings.password_hash_max_pending)
+
+
+async def _run_password_hash(func, *args):
+    if _password_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="登录请求过多，请稍后再试",
+            headers={"Retry-After": "1"},
+        )
+    async with _password_slots:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在密码哈希线程池中验证密码（排队已满时返回 503）"""
+    return await _run_password_hash(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建 JWT Token"""
     to_encode = data.copy()
@@ -39,11 +67,74 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+class CurrentUser(NamedTuple):
+    """认证缓存中的用户快照（不含密码哈希，不绑定数据库会话）"""
+    id: int
+    username: str
+    email: Optional[str]
+    avatar: Optional[str]
+    is_active: bool
+    created_at: datetime
+
+
+class UserCache:
+    """
+    已验证的 token -> 用户快照
+    后台一个页面会并发发出多个请求，缓存命中时不再解码 JWT 和查询数据库。
+    本进程内修改、删除用户时通过 ORM 事件清空；其他进程（如 update_admin.py）的修改在 ttl 秒内生效
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, CurrentUser]] = OrderedDict()
+
+    def get(self, token: str) -> Optional[CurrentUser]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user
+
+    def set(self, token: str, user: CurrentUser, token_expires_at: Optional[float] = None) -> None:
+        """缓存到 ttl 或 token 过期，以先到者为准"""
+        if self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        self._entries[token] = (expires_at, user)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+user_cache = UserCache(settings.auth_cache_ttl, settings.auth_cache_max_entries)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_user_cache(mapper, connection, target):
+    """用户被修改（改名、改密码、禁用）或删除后，已缓存的认证结果全部失效"""
+    user_cache.clear()
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
-) -> User:
-    """获取当前登录用户"""
+) -> CurrentUser:
+    """获取当前登录用户（优先使用认证缓存）"""
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭证",
@@ -62,10 +153,20 @@ async def get_current_user(
     user = result.scalar_one_or_none()
     if user is None:
         raise credentials_exception
-    return user
+    
+    snapshot = CurrentUser(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        avatar=user.avatar,
+        is_active=user.is_active,
+        created_at=user.created_at,
+    )
+    user_cache.set(token, snapshot, payload.get("exp"))
+    return snapshot
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     """获取当前活跃用户"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="用户已被禁用")
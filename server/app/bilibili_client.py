@@ -0,0 +1,241 @@
+"""
+Bilibili 收藏夹客户端
+整个应用共用一个 httpx.AsyncClient（连接池复用 TLS 连接），
+结果按 (收藏夹 ID, 页码, 每页数量) 缓存：过期后的一段时间内先返回旧数据并在后台刷新
+（stale-while-revalidate），同一页的并发请求只向上游发一次请求。
+配置了 BILIBILI_FAV_IDS 的收藏夹由后台任务定时抓取全部分页并保存快照到数据库，
+这些收藏夹的请求直接从内存中的快照分页返回，不再等待上游，上游故障时也能继续访问。
+transport 可替换为 httpx.MockTransport，便于在本地测试而不访问 B 站
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import httpx
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from app.config import get_settings
+from app.database import async_session
+from app.models import BilibiliSnapshot
+from app.singleflight import SingleFlight
+
+settings = get_settings()
+
+BILIBILI_FAV_API = "https://api.bilibili.com/x/v3/fav/resource/list"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Referer": "https://www.bilibili.com/",
+}
+
+# 抓取快照时每页的数量（接口允许的最大值）
+PREFETCH_PAGE_SIZE = 20
+
+CacheKey = Tuple[str, int, int]
+
+
+def simplify(data: dict) -> dict:
+    """只保留前端需要的字段"""
+    medias = data.get("data", {}).get("medias") or []
+    return {
+        "items": [
+            {
+                "id": item.get("id"),
+                "title": item.get("title"),
+                "cover": item.get("cover"),
+                "intro": item.get("intro", ""),
+                "duration": item.get("duration", 0),
+                "link": f"https://www.bilibili.com/video/{item.get('bvid')}",
+                "upper": item.get("upper", {}).get("name", ""),
+            }
+            for item in medias
+        ],
+        "total": data.get("data", {}).get("info", {}).get("media_count", 0),
+    }
+
+
+class BilibiliClient:
+    """带缓存和请求合并的收藏夹客户端，由应用生命周期启动和关闭"""
+
+    def __init__(
+        self,
+        ttl: float,
+        stale_ttl: float,
+        timeout: float,
+        max_connections: int,
+        max_entries: int,
+        fav_ids: Optional[List[str]] = None,
+        refresh_interval: float = 1800,
+        prefetch_concurrency: int = 4,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_entries = max_entries
+        self.fav_ids = fav_ids or []
+        self.refresh_interval = refresh_interval
+        self.prefetch_concurrency = prefetch_concurrency
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        # key -> (获取时间, 数据)，按最近使用排序
+        self._cache: "OrderedDict[CacheKey, Tuple[float, dict]]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._refreshing: Set[asyncio.Task] = set()
+        # 收藏夹 ID -> {items, total}，与数据库中的快照一致
+        self._snapshots: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """创建连接池，载入已保存的快照并启动定时抓取任务"""
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            transport=self.transport,
+        )
+        if self.fav_ids:
+            async with async_session() as db:
+                result = await db.execute(
+                    select(BilibiliSnapshot).where(BilibiliSnapshot.fav_id.in_(self.fav_ids))
+                )
+                for snapshot in result.scalars().all():
+                    self._snapshots[snapshot.fav_id] = {"items": snapshot.items, "total": snapshot.total}
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in self._refreshing:
+            task.cancel()
+        await asyncio.gather(*self._refreshing, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._cache.clear()
+        self._snapshots.clear()
+
+    async def fetch(self, fav_id: str, page: int, page_size: int) -> dict:
+        """请求上游并简化数据（不经过缓存）"""
+        if self._client is None:
+            raise RuntimeError("Bilibili 客户端未启动")
+        try:
+            response = await self._client.get(
+                BILIBILI_FAV_API,
+                params={"media_id": fav_id, "pn": page, "ps": page_size},
+            )
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Request to Bilibili timed out")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Failed to fetch from Bilibili: {e}")
+
+        if response.status_code != 200:
+            raise HTTPException(status_code=502, detail="Failed to fetch from Bilibili")
+        data = response.json()
+        if data.get("code") != 0:
+            raise HTTPException(status_code=400, detail=data.get("message", "Unknown error"))
+        return simplify(data)
+
+    async def fetch_all(self, fav_id: str) -> dict:
+        """抓取收藏夹全部分页：先取第一页得到总数，其余分页并发请求（限制并发数）"""
+        first = await self.fetch(fav_id, 1, PREFETCH_PAGE_SIZE)
+        pages = math.ceil(first["total"] / PREFETCH_PAGE_SIZE)
+        semaphore = asyncio.Semaphore(self.prefetch_concurrency)
+
+        async def fetch_page(page: int) -> dict:
+            async with semaphore:
+                return await self.fetch(fav_id, page, PREFETCH_PAGE_SIZE)
+
+        rest = await asyncio.gather(*(fetch_page(page) for page in range(2, pages + 1)))
+        items = first["items"] + [item for result in rest for item in result["items"]]
+        return {"items": items, "total": first["total"]}
+
+    async def refresh_snapshots(self) -> int:
+        """抓取所有配置的收藏夹并保存快照，失败的收藏夹保留旧快照，返回成功数量"""
+        refreshed = 0
+        for fav_id in self.fav_ids:
+            try:
+                snapshot = await self.fetch_all(fav_id)
+                async with async_session() as db:
+                    values = {**snapshot, "fetched_at": datetime.utcnow()}
+                    await db.execute(
+                        insert(BilibiliSnapshot)
+                        .values(fav_id=fav_id, **values)
+                        .on_conflict_do_update(index_elements=[BilibiliSnapshot.fav_id], set_=values)
+                    )
+                    await db.commit()
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else e
+                print(f"⚠️ 抓取 Bilibili 收藏夹 {fav_id} 失败，继续使用旧快照: {detail}")
+                continue
+            self._snapshots[fav_id] = snapshot
+            refreshed += 1
+        return refreshed
+
+    async def _run(self):
+        while True:
+            await self.refresh_snapshots()
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _load(self, key: CacheKey) -> dict:
+        result = await self.fetch(*key)
+        self._cache[key] = (time.monotonic(), result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return result
+
+    async def _revalidate(self, key: CacheKey) -> None:
+        try:
+            await self._flight.do(key, lambda: self._load(key))
+        except Exception as e:
+            print(f"⚠️ 后台刷新 Bilibili 收藏夹失败 {key}: {e}")
+
+    async def get_favorites(self, fav_id: str, page: int = 1, page_size: int = 20) -> dict:
+        """
+        获取收藏夹一页内容
+        有快照的收藏夹直接从快照分页；其余的未过期直接返回缓存，
+        过期不超过 stale_ttl 时返回旧数据并在后台刷新，否则等待上游
+        """
+        snapshot = self._snapshots.get(fav_id)
+        if snapshot is not None:
+            start = max(page - 1, 0) * page_size
+            return {"items": snapshot["items"][start:start + page_size], "total": snapshot["total"]}
+
+        key = (fav_id, page, page_size)
+        entry = self._cache.get(key)
+        if entry is not None:
+            fetched_at, result = entry
+            age = time.monotonic() - fetched_at
+            self._cache.move_to_end(key)
+            if age < self.ttl:
+                return result
+            if age < self.ttl + self.stale_ttl:
+                if not self._flight.in_flight(key):
+                    task = asyncio.create_task(self._revalidate(key))
+                    self._refreshing.add(task)
+                    task.add_done_callback(self._refreshing.discard)
+                return result
+        return await self._flight.do(key, lambda: self._load(key))
+
+
+bilibili_client = BilibiliClient(
+    ttl=settings.bilibili_cache_ttl,
+    stale_ttl=settings.bilibili_stale_ttl,
+    timeout=settings.bilibili_timeout,
+    max_connections=settings.bilibili_max_connections,
+    max_entries=settings.bilibili_cache_max_entries,
+    fav_ids=settings.bilibili_fav_ids_list,
+    refresh_interval=settings.bilibili_refresh_interval,
+    prefetch_concurrency=settings.bilibili_prefetch_concurrency,
+)
@@ -0,0 +1,157 @@
+"""
+公开接口响应缓存
+缓存序列化好的 JSON 响应体，按标签（posts、albums 等）失效。
+
+失效采用"标签版本号"方式：缓存 key 中包含所依赖标签的当前版本号，
+管理端写入后递增版本号，旧条目自然不可达并由 LRU/TTL 淘汰。
+读取时先取版本号再查数据库，因此并发写入不会把旧数据写回新版本的缓存。
+
+默认使用进程内 LRU 后端；CACHE_BACKEND=redis 时使用 Redis 兼容后端
+（任何实现 get/set/mget/incr 的异步客户端均可替换，例如本地测试替身）
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.config import get_settings
+from app.etag import conditional_response
+
+settings = get_settings()
+
+
+class MemoryCacheBackend:
+    """进程内 LRU 缓存，条目带过期时间"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_versions(self, tags: Sequence[str]) -> List[int]:
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    async def bump_versions(self, tags: Sequence[str]) -> None:
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisCacheBackend:
+    """Redis 兼容后端，多个 worker 进程共享缓存和标签版本号"""
+
+    def __init__(self, client, prefix: str = "blog:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def get_versions(self, tags: Sequence[str]) -> List[int]:
+        values = await self.client.mget([f"{self.prefix}tag:{tag}" for tag in tags])
+        return [int(v) if v is not None else 0 for v in values]
+
+    async def bump_versions(self, tags: Sequence[str]) -> None:
+        for tag in tags:
+            await self.client.incr(f"{self.prefix}tag:{tag}")
+
+
+class CacheEntry:
+    """一次缓存查找的结果，未命中时由调用方计算数据后 store"""
+
+    def __init__(self, cache: "ResponseCache", key: str, body: Optional[bytes]):
+        self.cache = cache
+        self.key = key
+        self.body = body
+
+    @property
+    def hit(self) -> bool:
+        return self.body is not None
+
+    async def store(self, payload: Any) -> None:
+        """序列化并写入缓存"""
+        self.body = encode_json(payload)
+        await self.cache.backend.set(self.key, self.body, self.cache.ttl)
+
+    def payload(self) -> Any:
+        """反序列化缓存内容（需要在响应前修改字段时使用）"""
+        return json.loads(self.body)
+
+    def response(self, request: Request) -> Response:
+        """
+        直接返回缓存的响应体，跳过响应模型校验和序列化
+        带 ETag，客户端缓存仍有效时返回 304
+        """
+        return conditional_response(request, self.body)
+
+
+class ResponseCache:
+    """按标签失效的响应缓存"""
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def lookup(self, name: str, tags: Sequence[str], **params) -> CacheEntry:
+        """
+        查找缓存
+        :param name: 接口名称
+        :param tags: 响应所依赖的数据标签，任一标签失效都会使该条目失效
+        :param params: 影响响应内容的请求参数
+        """
+        versions = await self.backend.get_versions(tags)
+        query = urlencode(sorted((k, "" if v is None else v) for k, v in params.items()))
+        tag_part = ",".join(f"{tag}.{version}" for tag, version in zip(tags, versions))
+        key = f"{name}?{query}#{tag_part}"
+        return CacheEntry(self, key, await self.backend.get(key))
+
+    async def invalidate(self, *tags: str) -> None:
+        """使依赖这些标签的缓存全部失效（写操作提交后调用）"""
+        await self.backend.bump_versions(tags)
+
+
+def encode_json(payload: Any) -> bytes:
+    """与 JSONResponse 相同的编码方式"""
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def create_response_cache() -> ResponseCache:
+    """根据配置创建缓存，Redis 客户端不可用时回退到进程内缓存"""
+    if settings.cache_backend == "redis":
+        try:
+            import redis.asyncio as redis
+            client = redis.from_url(settings.redis_url)
+            return ResponseCache(RedisCacheBackend(client), settings.cache_ttl)
+        except ImportError:
+            print("⚠️ 未安装 redis，响应缓存回退到进程内 LRU")
+    return ResponseCache(MemoryCacheBackend(settings.cache_max_entries), settings.cache_ttl)
+
+
+response_cache = create_response_cache()
@@ -11,10 +11,31 @@ class Settings(BaseSettings):
     # 数据库配置 (生产环境使用 data 目录便于 Docker volume 持久化)
     database_url: str = "sqlite+aiosqlite:///./blog.db"
     
+    # SQLite 性能参数（每个连接建立时通过 PRAGMA 设置，sqlite_tuning=false 时使用 SQLite 默认值）
+    sqlite_tuning: bool = True
+    sqlite_journal_mode: str = "WAL"  # WAL 模式下读写互不阻塞
+    sqlite_synchronous: str = "NORMAL"  # WAL 下 NORMAL 已能保证不损坏数据库
+    sqlite_busy_timeout: int = 5000  # 遇到写锁时最多等待的毫秒数
+    sqlite_cache_size: int = -65536  # 页缓存，负数表示 KiB（64MB）
+    sqlite_mmap_size: int = 0  # 内存映射读取字节数，0 为关闭（数据库较大且内存充足时可设为 268435456）
+    sqlite_temp_store: str = "MEMORY"  # 排序、临时表放在内存中
+    sqlite_pool_size: int = 5  # 连接池大小，连接复用后 PRAGMA 只在建立连接时执行一次
+    
     # JWT 配置
     secret_key: str = "your-secret-key-change-this-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24 * 7  # 7 天
+    # 认证缓存：已验证的 token 在 ttl 秒内不再查询用户（0 表示不缓存）
+    auth_cache_ttl: int = 60
+    auth_cache_max_entries: int = 256
+    
+    # 登录保护：bcrypt 在专用线程池中计算，排队超过上限时返回 503；
+    # 每个 IP 在 login_window_seconds 内最多尝试 login_max_attempts 次，超出返回 429
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 8
+    login_max_attempts: int = 10
+    login_window_seconds: int = 300
+    login_trust_forwarded_for: bool = False  # 部署在反向代理之后时开启，按 X-Forwarded-For 识别客户端 IP
     
     # 管理员默认账户（请在 .env 文件或环境变量中配置）
     admin_username: str = "admin"
@@ -23,6 +44,53 @@ class Settings(BaseSettings):
     # CORS 配置 (逗号分隔的域名列表)
     cors_origins: str = "*"
     
+    # 浏览量写回间隔（秒），阅读时只累加内存计数，定时批量写入数据库
+    view_count_flush_interval: int = 10
+    
+    # 公开接口响应缓存 (memory / redis)，写操作按标签失效，TTL 只是兜底
+    cache_backend: str = "memory"
+    cache_ttl: int = 600
+    cache_max_entries: int = 1000
+    redis_url: str = "redis://localhost:6379/0"
+    
+    # 上传文件：分块流式写入磁盘，单个文件大小上限
+    upload_max_bytes: int = 30 * 1024 * 1024
+    upload_chunk_size: int = 1024 * 1024
+    
+    # 相册缩略图（后台进程池生成，thumbnail_use_processes=false 时改用线程池）
+    thumbnail_workers: int = 2
+    thumbnail_use_processes: bool = True
+    thumbnail_size: int = 400  # 缩略图最大边长
+    thumbnail_quality: int = 85  # JPEG 压缩质量
+    
+    # 响应式图片：为照片和编辑器图片生成多种宽度的 WebP/AVIF 版本（逗号分隔，AVIF 需 Pillow 支持）
+    image_variant_widths: str = "480,960,1600"
+    image_variant_formats: str = "avif,webp"
+    image_variant_quality: int = 80
+    
+    # 按需缩放接口 /uploads/resize/{w}x{h}/{path}：只允许列表中的尺寸和质量，防止刷缓存
+    image_resize_sizes: str = "160x160,400x400,480x0,960x0,1600x0"  # 0 表示该方向不限制
+    image_resize_qualities: str = "60,80,90"
+    image_resize_default_quality: int = 80
+    image_resize_cache_dir: str = "./cache/resize"
+    image_resize_cache_max_bytes: int = 512 * 1024 * 1024  # 磁盘缓存上限，超出后按最近最少使用淘汰
+    
+    # Bilibili 收藏夹代理：共享连接池，结果缓存 ttl 秒，过期后 stale_ttl 秒内先返回旧数据并在后台刷新
+    bilibili_cache_ttl: int = 300
+    bilibili_stale_ttl: int = 3600
+    bilibili_cache_max_entries: int = 200
+    bilibili_timeout: float = 10.0
+    bilibili_max_connections: int = 10
+    # 需要后台定时抓取的收藏夹 ID（逗号分隔），快照保存在数据库中，上游不可用时仍可访问
+    bilibili_fav_ids: str = ""
+    bilibili_refresh_interval: int = 1800
+    bilibili_prefetch_concurrency: int = 4  # 抓取分页时的最大并发请求数
+    
+    # 后台 Banner 预览缩略图（启动和上传后预生成；格式为 jpeg / webp / avif / png）
+    banner_thumbnail_width: int = 400
+    banner_thumbnail_format: str = "jpeg"
+    banner_thumbnail_quality: int = 70
+    
     @property
     def cors_origins_list(self) -> List[str]:
         """将逗号分隔的 CORS 域名转换为列表"""
@@ -30,6 +98,36 @@ class Settings(BaseSettings):
             return ["*"]
         return [origin.strip() for origin in self.cors_origins.split(",") if origin.strip()]
     
+    @property
+    def image_variant_widths_list(self) -> List[int]:
+        """将逗号分隔的宽度转换为从小到大的列表"""
+        return sorted({int(width) for width in self.image_variant_widths.split(",") if width.strip()})
+    
+    @property
+    def image_variant_formats_list(self) -> List[str]:
+        """将逗号分隔的图片格式转换为列表"""
+        return [fmt.strip().lower() for fmt in self.image_variant_formats.split(",") if fmt.strip()]
+    
+    @property
+    def bilibili_fav_ids_list(self) -> List[str]:
+        """将逗号分隔的收藏夹 ID 转换为列表"""
+        return [fav_id.strip() for fav_id in self.bilibili_fav_ids.split(",") if fav_id.strip()]
+    
+    @property
+    def image_resize_sizes_set(self) -> set:
+        """允许的缩放尺寸 {(宽, 高)}"""
+        sizes = set()
+        for size in self.image_resize_sizes.split(","):
+            if size.strip():
+                width, height = size.strip().lower().split("x")
+                sizes.add((int(width), int(height)))
+        return sizes
+    
+    @property
+    def image_resize_qualities_set(self) -> set:
+        """允许的压缩质量"""
+        return {int(q) for q in self.image_resize_qualities.split(",") if q.strip()}
+    
     class Config:
         env_file = ".env"
 
@@ -1,12 +1,34 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from typing import List
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase
 from app.config import get_settings
 
 settings = get_settings()
 
+
+def engine_options(database_url: str) -> dict:
+    """
+    创建引擎的额外参数
+    aiosqlite 文件数据库默认使用 NullPool，每个会话都会新建连接并重新执行 PRAGMA，
+    开启性能参数时改用连接池复用连接
+    """
+    url = make_url(database_url)
+    if not settings.sqlite_tuning or url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": settings.sqlite_pool_size,
+        "max_overflow": settings.sqlite_pool_size,
+    }
+
+
 engine = create_async_engine(
     settings.database_url,
     echo=settings.debug,
+    **engine_options(settings.database_url),
 )
 
 async_session = async_sessionmaker(
@@ -16,6 +38,36 @@ async_session = async_sessionmaker(
 )
 
 
+def sqlite_pragmas() -> List[str]:
+    """根据配置生成 SQLite 性能 PRAGMA"""
+    if not settings.sqlite_tuning:
+        return []
+    return [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}",
+        f"PRAGMA cache_size={int(settings.sqlite_cache_size)}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}",
+        f"PRAGMA temp_store={settings.sqlite_temp_store}",
+    ]
+
+
+def install_sqlite_pragmas(target: AsyncEngine, pragmas: List[str]) -> None:
+    """在每个新建的 SQLite 连接上执行 PRAGMA"""
+    if target.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(target.sync_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+install_sqlite_pragmas(engine, sqlite_pragmas())
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -29,7 +81,64 @@ async def get_db():
             await session.close()
 
 
+def add_missing_columns(sync_conn) -> List[str]:
+    """
+    为已存在的表补加模型中新增的列
+    只支持可为空的列（SQLite 的 ADD COLUMN 限制），其余情况需要手动迁移
+    """
+    inspector = inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                print(f"⚠️ 无法自动添加非空列 {table.name}.{column.name}，请手动迁移")
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def create_missing_indexes(sync_conn) -> List[str]:
+    """
+    为已存在的表补建模型中新增的索引
+    create_all 只会为新建的表创建索引，旧版本的数据库需要在这里补齐
+    """
+    inspector = inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if not {column.name for column in index.columns} <= columns:
+                print(f"⚠️ 表 {table.name} 缺少索引 {index.name} 所需的列，跳过")
+                continue
+            index.create(sync_conn)
+            created.append(index.name)
+    return created
+
+
 async def init_db():
     """初始化数据库表"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        added = await conn.run_sync(add_missing_columns)
+        if added:
+            print(f"✅ 已补加字段: {', '.join(added)}")
+        created = await conn.run_sync(create_missing_indexes)
+        if created:
+            if conn.dialect.name == "sqlite":
+                # 更新统计信息，让查询规划器使用新索引
+                await conn.execute(text("ANALYZE"))
+            print(f"✅ 已补建索引: {', '.join(created)}")
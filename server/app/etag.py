@@ -0,0 +1,75 @@
+"""
+HTTP 条件请求（ETag / Last-Modified）
+资源未变化时返回 304，不再传输响应体
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+
+# 浏览器每次都向服务器验证，未变化时由 304 复用本地副本
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(body: bytes, weak: bool = False) -> str:
+    """根据响应体生成 ETag"""
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified_since(request: Request, last_modified: datetime) -> bool:
+    """If-Modified-Since 是否命中（只精确到秒）"""
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return to_utc(last_modified).replace(microsecond=0) <= since
+
+
+def to_utc(value: datetime) -> datetime:
+    """数据库中保存的是不带时区的 UTC 时间"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+    media_type: str = "application/json",
+    headers: Optional[dict] = None,
+) -> Response:
+    """
+    生成支持条件请求的响应
+    未指定 etag 时根据响应体计算；If-None-Match 优先于 If-Modified-Since
+    """
+    etag = etag or make_etag(body)
+    response_headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, **(headers or {})}
+    if last_modified is not None:
+        response_headers["Last-Modified"] = format_datetime(to_utc(last_modified), usegmt=True)
+
+    if request.headers.get("if-none-match"):
+        not_modified = etag_matches(request, etag)
+    else:
+        not_modified = last_modified is not None and not_modified_since(request, last_modified)
+
+    if not_modified:
+        return Response(status_code=304, headers=response_headers)
+    return Response(content=body, media_type=media_type, headers=response_headers)
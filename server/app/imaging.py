@@ -0,0 +1,218 @@
+"""
+图片处理
+这里的函数都是同步的 CPU 密集操作，由 thumbnail_queue 放到进程池中执行，
+不要在异步接口里直接调用
+"""
+import base64
+import io
+import os
+import tempfile
+from typing import List, Sequence, Tuple
+from PIL import Image, ImageOps
+
+# 响应式图片格式 -> (Pillow 格式名, 文件扩展名)
+VARIANT_FORMATS = {
+    "avif": ("AVIF", "avif"),
+    "webp": ("WEBP", "webp"),
+}
+
+# 不生成响应式版本的原图格式（动图只能保留原文件）
+SKIP_VARIANT_EXTENSIONS = {".gif"}
+
+
+def can_encode(pil_format: str) -> bool:
+    """当前 Pillow 能否编码该格式（AVIF 需要较新的 Pillow 或插件）"""
+    Image.init()
+    return pil_format in Image.SAVE
+
+
+def supported_formats(formats: Sequence[str]) -> List[str]:
+    """过滤出当前 Pillow 能编码的响应式图片格式"""
+    return [fmt for fmt in formats if fmt in VARIANT_FORMATS and can_encode(VARIANT_FORMATS[fmt][0])]
+
+
+def open_image(path: str) -> Image.Image:
+    """打开图片，按 EXIF 方向旋转，透明图片转为 RGBA，其余转为 RGB"""
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        mode = "RGBA" if has_alpha else "RGB"
+        if img.mode != mode:
+            img = img.convert(mode)
+        return img
+
+
+def save_image(img: Image.Image, path: str, format: str, **options) -> int:
+    """
+    保存图片并返回字节数
+    先写入临时文件再替换，避免静态文件服务读到写了一半的图片
+    """
+    # 临时文件名唯一，多个进程同时写同一输出时互不干扰
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format, **options)
+        # mkstemp 创建的文件只有属主可读，静态文件服务需要与普通上传文件相同的权限
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return os.path.getsize(path)
+
+
+def save_thumbnail(img: Image.Image, thumb_path: str, size: Tuple[int, int], quality: int) -> int:
+    """生成等比例缩略图（JPEG），返回缩略图字节数"""
+    thumb = img.convert("RGB") if img.mode != "RGB" else img.copy()
+    thumb.thumbnail(size, Image.Resampling.LANCZOS)
+    return save_image(thumb, thumb_path, "JPEG", quality=quality, optimize=True)
+
+
+def save_variants(
+    img: Image.Image,
+    variant_dir: str,
+    name: str,
+    widths: Sequence[int],
+    formats: Sequence[str],
+    quality: int,
+) -> List[dict]:
+    """
+    按宽度阶梯生成各格式的版本，返回 [{width, height, format, file, size}]
+    不放大图片：不小于原图宽度的档位合并为一份原图宽度的版本。
+    从大到小逐级缩放，每一级都以上一级为源，减少 LANCZOS 的计算量
+    """
+    fits = sorted((w for w in widths if w < img.width), reverse=True)
+    if len(fits) < len(widths):
+        fits.insert(0, img.width)
+
+    variants = []
+    current = img
+    for width in fits:
+        height = max(1, round(img.height * width / img.width))
+        if current.width != width:
+            current = current.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            pil_format, ext = VARIANT_FORMATS[fmt]
+            filename = f"{name}_{width}w.{ext}"
+            size = save_image(current, os.path.join(variant_dir, filename), pil_format, quality=quality)
+            variants.append({"width": width, "height": height, "format": fmt, "file": filename, "size": size})
+    return variants
+
+
+def make_thumbnail(source_path: str, thumb_path: str, size: Tuple[int, int], quality: int) -> int:
+    """生成缩略图，返回缩略图字节数"""
+    return save_thumbnail(open_image(source_path), thumb_path, size, quality)
+
+
+def make_variants(
+    source_path: str,
+    variant_dir: str,
+    widths: Sequence[int],
+    formats: Sequence[str],
+    quality: int,
+) -> List[dict]:
+    """为单张图片生成响应式版本（编辑器上传的图片）"""
+    name, ext = os.path.splitext(os.path.basename(source_path))
+    if ext.lower() in SKIP_VARIANT_EXTENSIONS:
+        return []
+    return save_variants(open_image(source_path), variant_dir, name, widths, formats, quality)
+
+
+# 占位图（LQIP）的最大边长，放大后配合 CSS 模糊使用
+PLACEHOLDER_SIZE = 16
+
+
+def dominant_color(img: Image.Image) -> str:
+    """缩小后量化为少量颜色，取出现最多的颜色（#rrggbb）"""
+    small = img.convert("RGB")
+    small.thumbnail((64, 64), Image.Resampling.BOX)
+    quantized = small.quantize(colors=5)
+    count, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def placeholder_data_uri(img: Image.Image) -> str:
+    """生成极小的模糊占位图，以 data URI 内联在接口响应中（通常只有一两百字节）"""
+    small = img.copy()
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BOX)
+    buffer = io.BytesIO()
+    if can_encode("WEBP"):
+        small.save(buffer, "WEBP", quality=40)
+        media_type = "image/webp"
+    else:
+        small.convert("RGB").save(buffer, "JPEG", quality=40)
+        media_type = "image/jpeg"
+    return f"data:{media_type};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def image_metadata(img: Image.Image) -> dict:
+    """前端排版和占位需要的信息：宽高（已按 EXIF 方向旋转）、主色调、占位图"""
+    return {
+        "width": img.width,
+        "height": img.height,
+        "color": dominant_color(img),
+        "placeholder": placeholder_data_uri(img),
+    }
+
+
+def read_photo_metadata(source_path: str) -> dict:
+    """只读取照片元数据（已生成缩略图的旧照片回填用）"""
+    return image_metadata(open_image(source_path))
+
+
+def process_photo(
+    source_path: str,
+    thumb_path: str,
+    thumb_size: Tuple[int, int],
+    thumb_quality: int,
+    variant_dir: str,
+    widths: Sequence[int],
+    formats: Sequence[str],
+    variant_quality: int,
+) -> dict:
+    """
+    相册照片：一次解码同时生成缩略图、响应式版本和元数据
+    返回 {variants, width, height, color, placeholder}
+    """
+    img = open_image(source_path)
+    save_thumbnail(img, thumb_path, thumb_size, thumb_quality)
+    name, ext = os.path.splitext(os.path.basename(source_path))
+    variants = []
+    if ext.lower() not in SKIP_VARIANT_EXTENSIONS:
+        variants = save_variants(img, variant_dir, name, widths, formats, variant_quality)
+    return {"variants": variants, **image_metadata(img)}
+
+
+# 按需缩放接口支持的输出格式 -> Pillow 格式名
+RESIZE_FORMATS = {
+    "webp": "WEBP",
+    "avif": "AVIF",
+    "jpeg": "JPEG",
+    "png": "PNG",
+}
+
+
+def resize_image(source_path: str, dest_path: str, width: int, height: int, fmt: str, quality: int) -> int:
+    """
+    等比例缩放到 width x height 以内（0 表示该方向不限制，不会放大），返回文件字节数
+    """
+    img = open_image(source_path)
+    img.thumbnail((width or img.width, height or img.height), Image.Resampling.LANCZOS)
+    pil_format = RESIZE_FORMATS[fmt]
+    if pil_format == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+    if pil_format == "PNG":
+        return save_image(img, dest_path, pil_format, optimize=True)
+    return save_image(img, dest_path, pil_format, quality=quality)
+
+
+def banner_thumbnail_fresh(source_path: str, thumb_path: str) -> bool:
+    """缩略图是否存在且不早于原图"""
+    try:
+        return os.stat(thumb_path).st_mtime_ns >= os.stat(source_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,63 @@
+"""
+登录尝试限流
+按客户端 IP 记录滑动窗口内的登录尝试次数，超过上限时在计算 bcrypt 之前直接拒绝，
+撞库请求不会消耗密码哈希线程池；登录成功后清除该 IP 的记录
+"""
+import time
+from collections import deque
+from typing import Deque, Dict
+from fastapi import Request
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def client_ip(request: Request) -> str:
+    """客户端 IP；信任反向代理时取 X-Forwarded-For 中最后一个地址（由最近的代理添加）"""
+    if settings.login_trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class LoginThrottle:
+    """滑动窗口计数，记录数超过上限时清理已过期的 IP"""
+
+    def __init__(self, max_attempts: int, window: float, max_clients: int = 10000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_clients = max_clients
+        self._attempts: Dict[str, Deque[float]] = {}
+
+    def _prune(self, attempts: Deque[float], now: float) -> None:
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+
+    def retry_after(self, ip: str) -> int:
+        """被限流时返回需要等待的秒数，否则返回 0"""
+        attempts = self._attempts.get(ip)
+        if not attempts:
+            return 0
+        now = time.monotonic()
+        self._prune(attempts, now)
+        if len(attempts) < self.max_attempts:
+            return 0
+        return max(1, int(attempts[0] + self.window - now) + 1)
+
+    def record(self, ip: str) -> None:
+        """记录一次登录尝试"""
+        now = time.monotonic()
+        if ip not in self._attempts and len(self._attempts) >= self.max_clients:
+            for key in list(self._attempts):
+                self._prune(self._attempts[key], now)
+                if not self._attempts[key]:
+                    del self._attempts[key]
+        self._attempts.setdefault(ip, deque()).append(now)
+
+    def reset(self, ip: str) -> None:
+        """登录成功后清除记录"""
+        self._attempts.pop(ip, None)
+
+
+login_throttle = LoginThrottle(settings.login_max_attempts, settings.login_window_seconds)
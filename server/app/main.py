@@ -9,7 +9,11 @@ from app.database import init_db, async_session
 from app.models import User
 from app.auth import get_password_hash
 from app.config import get_settings
-from app.routers import posts, admin, bilibili, tools, albums, search, about, banner, friends
+from app.view_counter import view_counter
+from app.search_index import search_index
+from app.thumbnail_queue import thumbnail_queue
+from app.bilibili_client import bilibili_client
+from app.routers import posts, admin, bilibili, tools, albums, search, about, banner, friends, resize
 
 settings = get_settings()
 
@@ -40,11 +44,20 @@ async def lifespan(app: FastAPI):
     print("🚀 正在初始化数据库...")
     await init_db()
     await create_default_admin()
+    await search_index.setup()
     print("✅ 数据库初始化完成")
+    view_counter.start()
+    await thumbnail_queue.start()
+    banner.prewarm_thumbnails()
+    await bilibili_client.start()
     
     yield
     
     # 关闭时
+    await bilibili_client.stop()
+    await banner.cancel_prewarm()
+    await thumbnail_queue.stop()
+    await view_counter.stop()
     print("👋 应用关闭")
 
 
@@ -62,6 +75,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],  # 评论分页游标、条件请求
 )
 
 # 注册路由
@@ -75,6 +89,7 @@ app.include_router(about.router, prefix="/api/admin", tags=["关于页面"])
 app.include_router(banner.router, prefix="/api/admin", tags=["Banner管理"])
 app.include_router(banner.router, prefix="/api", tags=["Banner公开接口"])  # 公开接口
 app.include_router(friends.router, prefix="/api", tags=["友链"])
+app.include_router(resize.router, tags=["图片缩放"])  # 必须在 /uploads 静态目录挂载之前注册
 
 
 # 获取项目根目录 (Docker 环境下为 /app)
@@ -0,0 +1,208 @@
+"""
+按内容哈希去重的图片存储（uploads/photos）
+文件名取 SHA-256 的前 32 位，相同内容的上传只保存一份原图，缩略图、响应式版本也随之共享。
+media_files 表记录每个文件的引用次数，相册照片删除时减少引用，归零且数据库中确实没有引用时才删除文件；
+sweep_media 根据数据库中的实际引用重新计算引用次数并找出孤立文件
+"""
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import MediaFile, Photo, Post, Album, Friend, Tool, User
+from app.thumbnail_queue import UPLOADS_ROOT, THUMB_DIR, VARIANT_DIR, thumbnail_paths
+from app.upload_storage import store_upload
+
+UPLOAD_DIR = os.path.join(UPLOADS_ROOT, "photos")
+URL_PREFIX = "/uploads/photos/"
+
+# 文本中引用的图片（包括按需缩放地址），只取文件名
+REFERENCE_PATTERN = re.compile(r"/uploads/(?:resize/\d+x\d+/)?photos/([0-9A-Za-z_\-]+\.[0-9A-Za-z]+)")
+
+# 可能引用上传图片的文本字段
+TEXT_REFERENCE_COLUMNS = (
+    Post.content, Post.cover_image, Album.cover, Friend.avatar, Tool.icon, User.avatar,
+)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+async def save_media(db: AsyncSession, file: UploadFile, ext: str) -> Tuple[MediaFile, bool]:
+    """
+    保存上传的图片并增加引用次数，内容相同的文件只保存一份
+    返回 (MediaFile, 是否新写入了文件)，引用次数在调用方提交事务后生效
+    """
+    staging_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.upload")
+    stored = await store_upload(file, staging_path)
+
+    result = await db.execute(select(MediaFile).where(MediaFile.sha256 == stored.sha256))
+    media = result.scalar_one_or_none()
+    url = media.url if media else f"{URL_PREFIX}{stored.sha256[:32]}{ext}"
+    filepath = os.path.join(UPLOAD_DIR, os.path.basename(url))
+
+    created = not os.path.exists(filepath)
+    if created:
+        os.replace(staging_path, filepath)
+    else:
+        os.remove(staging_path)
+
+    # 并发上传相同内容时由唯一约束合并为一行
+    await db.execute(
+        insert(MediaFile)
+        .values(sha256=stored.sha256, url=url, size=stored.size, ref_count=1)
+        .on_conflict_do_update(
+            index_elements=[MediaFile.sha256],
+            set_={"ref_count": MediaFile.ref_count + 1},
+        )
+    )
+    result = await db.execute(
+        select(MediaFile).where(MediaFile.sha256 == stored.sha256).execution_options(populate_existing=True)
+    )
+    return result.scalar_one(), created
+
+
+def media_paths(url: str) -> List[str]:
+    """文件及其衍生文件（缩略图、响应式版本）的磁盘路径"""
+    name = os.path.splitext(os.path.basename(url))[0]
+    paths = [os.path.join(UPLOAD_DIR, os.path.basename(url)), thumbnail_paths(url)[1]]
+    if os.path.isdir(VARIANT_DIR):
+        # 响应式版本命名为 {name}_{width}w.{ext}
+        variant = re.compile(rf"^{re.escape(name)}_\d+w\.\w+$")
+        paths.extend(os.path.join(VARIANT_DIR, f) for f in os.listdir(VARIANT_DIR) if variant.match(f))
+    return paths
+
+
+def remove_files(paths: List[str]) -> None:
+    """删除文件（事务提交后调用）"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def release_media(db: AsyncSession, url: str) -> List[str]:
+    """
+    减少文件的引用次数，返回引用归零、需要在提交后删除的文件路径
+    引用次数归零时再按数据库中的实际引用（照片和文章等文本中的地址）复核，仍被引用则保留并校正引用次数。
+    调用前应先删除引用它的照片并 flush
+    """
+    if not url or not url.startswith(URL_PREFIX):
+        return []
+
+    filename = os.path.basename(url)
+    result = await db.execute(select(MediaFile).where(MediaFile.url == url))
+    media = result.scalar_one_or_none()
+    if media is None:
+        # 去重存储之前上传的文件：没有其他引用时删除
+        references = await count_references(db, filename)
+        return [] if references[filename] else media_paths(url)
+
+    await db.execute(
+        update(MediaFile).where(MediaFile.id == media.id).values(ref_count=MediaFile.ref_count - 1)
+    )
+    await db.refresh(media)
+    if media.ref_count > 0:
+        return []
+    references = await count_references(db, filename)
+    if references[filename]:
+        media.ref_count = references[filename]
+        return []
+    await db.delete(media)
+    return media_paths(url)
+
+
+async def count_references(db: AsyncSession, filename: Optional[str] = None) -> Counter:
+    """
+    统计数据库中每个文件名被引用的次数（照片 + 文本字段中的地址）
+    指定 filename 时只统计这一个文件
+    """
+    references: Counter = Counter()
+    photos = select(Photo.url)
+    if filename is not None:
+        photos = photos.where(Photo.url == URL_PREFIX + filename)
+    for (url,) in (await db.execute(photos)).all():
+        if url and url.startswith(URL_PREFIX):
+            references[os.path.basename(url)] += 1
+    for column in TEXT_REFERENCE_COLUMNS:
+        result = await db.execute(select(column).where(column.contains(filename or "/uploads/")))
+        for (value,) in result.all():
+            references.update(set(REFERENCE_PATTERN.findall(value)))
+    if filename is not None:
+        return Counter({filename: references[filename]})
+    return references
+
+
+async def find_variants(db: AsyncSession, *texts: Optional[str]) -> Dict[str, list]:
+    """
+    查找文本中引用的编辑器图片的响应式版本，返回 {原图 URL: variants}
+    按需缩放地址也按原图 URL 归并，没有响应式版本的图片不包含在结果中
+    """
+    urls = {URL_PREFIX + name for text in texts if text for name in REFERENCE_PATTERN.findall(text)}
+    if not urls:
+        return {}
+    result = await db.execute(
+        select(MediaFile.url, MediaFile.variants).where(MediaFile.url.in_(urls), MediaFile.variants != None)
+    )
+    return {url: variants for url, variants in result.all() if variants}
+
+
+def find_orphans(referenced: Set[str], grace_seconds: int) -> List[str]:
+    """找出未被引用的原图及其衍生文件，以及原图已不存在的衍生文件"""
+    cutoff = time.time() - grace_seconds
+    originals = {
+        f for f in os.listdir(UPLOAD_DIR)
+        if os.path.isfile(os.path.join(UPLOAD_DIR, f)) and os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS
+    }
+    live = {os.path.splitext(f)[0] for f in originals}
+    orphans = []
+    for f in sorted(originals - referenced):
+        path = os.path.join(UPLOAD_DIR, f)
+        if os.path.getmtime(path) < cutoff:
+            orphans.extend(p for p in media_paths(URL_PREFIX + f) if os.path.exists(p))
+            live.discard(os.path.splitext(f)[0])
+
+    # 原图已删除但衍生文件残留
+    for directory, suffix in ((THUMB_DIR, "_thumb"), (VARIANT_DIR, "_")):
+        if not os.path.isdir(directory):
+            continue
+        for f in os.listdir(directory):
+            base = f.rsplit(suffix, 1)[0]
+            path = os.path.join(directory, f)
+            if base not in live and path not in orphans and os.path.getmtime(path) < cutoff:
+                orphans.append(path)
+    return orphans
+
+
+async def sweep_media(db: AsyncSession, dry_run: bool = True, grace_seconds: int = 24 * 3600) -> Dict:
+    """
+    按数据库中的实际引用校正引用次数，并清理孤立文件
+    最近 grace_seconds 内修改的文件不会被清理（可能是刚上传、尚未保存到文章的图片），
+    这些文件的引用次数也只增不减
+    """
+    references = await count_references(db)
+    orphans = await run_in_threadpool(find_orphans, set(references), grace_seconds)
+    orphan_urls = {URL_PREFIX + os.path.basename(p) for p in orphans if os.path.dirname(p) == UPLOAD_DIR}
+    report = {
+        "dry_run": dry_run,
+        "orphans": [os.path.relpath(p, UPLOADS_ROOT) for p in orphans],
+        "bytes": sum(os.path.getsize(p) for p in orphans if os.path.exists(p)),
+    }
+
+    if not dry_run:
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+        for media in (await db.execute(select(MediaFile))).scalars().all():
+            count = references.get(os.path.basename(media.url), 0)
+            media.ref_count = max(media.ref_count, count) if media.created_at >= cutoff else count
+        if orphan_urls:
+            await db.execute(delete(MediaFile).where(MediaFile.url.in_(orphan_urls)))
+        await db.commit()
+        await run_in_threadpool(remove_files, orphans)
+    return report
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String, Text, Boolean, DateTime, ForeignKey, Table, Column, Integer
+from sqlalchemy import String, Text, Boolean, DateTime, ForeignKey, Table, Column, Integer, Index, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 
@@ -11,6 +11,8 @@ post_tags = Table(
     Base.metadata,
     Column("post_id", Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True),
     Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    # 主键以 post_id 开头，按标签筛选文章需要单独的 tag_id 索引
+    Index("ix_post_tags_tag_id", "tag_id"),
 )
 
 
@@ -58,6 +60,10 @@ class Tag(Base):
 class Post(Base):
     """文章"""
     __tablename__ = "posts"
+    __table_args__ = (
+        # 文章列表：筛选已发布，按置顶、发布时间排序
+        Index("ix_posts_published_pinned_created", "is_published", "is_pinned", "created_at"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(200))
@@ -85,6 +91,16 @@ class Post(Base):
 class Comment(Base):
     """评论"""
     __tablename__ = "comments"
+    __table_args__ = (
+        # 文章评论树、评论数统计：按文章和审核状态筛选，按时间排序
+        Index("ix_comments_post_approved_created", "post_id", "is_approved", "created_at"),
+        # 回复查询
+        Index("ix_comments_parent_id", "parent_id"),
+        # 后台评论列表：按审核状态筛选，按时间排序
+        Index("ix_comments_approved_created", "is_approved", "created_at"),
+        # 后台评论列表：不筛选审核状态时按时间分页（索引隐含 id，可直接按 (created_at, id) 排序）
+        Index("ix_comments_created", "created_at"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     nickname: Mapped[str] = mapped_column(String(50))
@@ -137,10 +153,19 @@ class Album(Base):
 class Photo(Base):
     """照片"""
     __tablename__ = "photos"
+    __table_args__ = (
+        # 相册照片：按相册读取，按排序字段排序
+        Index("ix_photos_album_sort", "album_id", "sort_order"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     url: Mapped[str] = mapped_column(String(500))  # 照片 URL
     thumbnail: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)  # 缩略图
+    variants: Mapped[Optional[list]] = mapped_column(JSON(none_as_null=True), nullable=True)  # 响应式图片版本（srcset）
+    width: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # 原图宽度（按 EXIF 方向）
+    height: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # 原图高度
+    color: Mapped[Optional[str]] = mapped_column(String(7), nullable=True)  # 主色调 #rrggbb
+    placeholder: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # 模糊占位图 data URI
     title: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)  # 标题
     description: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)  # 描述
     sort_order: Mapped[int] = mapped_column(Integer, default=0)  # 排序
@@ -153,6 +178,29 @@ class Photo(Base):
     album: Mapped["Album"] = relationship(back_populates="photos")
 
 
+class MediaFile(Base):
+    """按内容哈希存储的上传文件，相同内容只保存一份（含缩略图等衍生文件）"""
+    __tablename__ = "media_files"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), unique=True, index=True)  # 文件内容哈希
+    url: Mapped[str] = mapped_column(String(500), unique=True)  # 文件 URL
+    size: Mapped[int] = mapped_column(Integer)  # 字节数
+    ref_count: Mapped[int] = mapped_column(Integer, default=0)  # 引用次数，归零后删除文件
+    variants: Mapped[Optional[list]] = mapped_column(JSON(none_as_null=True), nullable=True)  # 编辑器图片的响应式版本
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class BilibiliSnapshot(Base):
+    """B 站收藏夹快照（后台定时抓取全部内容，接口直接从本地返回）"""
+    __tablename__ = "bilibili_snapshots"
+    
+    fav_id: Mapped[str] = mapped_column(String(32), primary_key=True)  # 收藏夹 ID
+    items: Mapped[list] = mapped_column(JSON)  # 简化后的视频列表
+    total: Mapped[int] = mapped_column(Integer, default=0)  # 收藏夹视频总数
+    fetched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)  # 最近一次成功抓取时间
+
+
 class Friend(Base):
     """友情链接"""
     __tablename__ = "friends"
@@ -0,0 +1,124 @@
+"""
+按需缩放图片的磁盘缓存
+缓存文件名由源文件路径、修改时间和缩放参数的哈希决定，源文件更新后自然生成新的缓存；
+总大小超过上限时按最近最少使用淘汰。
+同一张图片的并发请求经 single-flight 合并，只缩放一次。
+扫描目录、stat 和删除文件都在线程池中执行，不阻塞事件循环
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.imaging import resize_image
+from app.singleflight import SingleFlight
+from app.thumbnail_queue import thumbnail_queue
+
+settings = get_settings()
+
+# 最近访问过的文件不淘汰（可能正在由 FileResponse 发送），总大小可暂时超过上限
+EVICT_GRACE_SECONDS = 60
+
+
+def remove_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class ResizeCache:
+    """带大小上限的 LRU 磁盘缓存"""
+
+    def __init__(self, directory: str, max_bytes: int, grace: float = EVICT_GRACE_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.grace = grace
+        # 文件名 -> (大小, 最近访问时间)，按最近使用排序
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._total = 0
+        self._flight = SingleFlight()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    def _scan(self) -> List[Tuple[str, int]]:
+        """扫描已有缓存文件（在线程池中执行），按访问时间从旧到新返回 (文件名, 大小)"""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            files.append((stat.st_atime, entry.name, stat.st_size))
+        return [(name, size) for _, name, size in sorted(files)]
+
+    async def _load(self) -> None:
+        """恢复 LRU 顺序（启动前的文件视为很久未访问），超出上限的部分直接淘汰"""
+        async with self._load_lock:
+            if self._loaded:
+                return
+            for name, size in await run_in_threadpool(self._scan):
+                self._entries[name] = (size, 0.0)
+                self._total += size
+            self._loaded = True
+            await run_in_threadpool(remove_files, self._evict())
+
+    def cache_key(self, source: str, width: int, height: int, fmt: str, quality: int) -> str:
+        """缓存文件名（源文件修改后 key 随之变化）"""
+        stat = os.stat(source)
+        raw = f"{source}|{stat.st_mtime_ns}|{stat.st_size}|{width}x{height}|{fmt}|{quality}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest() + "." + fmt
+
+    def _lookup(self, source: str, width: int, height: int, fmt: str, quality: int) -> Tuple[str, bool]:
+        """计算缓存 key 并检查文件是否存在（在线程池中执行）"""
+        name = self.cache_key(source, width, height, fmt, quality)
+        return name, os.path.exists(os.path.join(self.directory, name))
+
+    async def get(self, source: str, width: int, height: int, fmt: str, quality: int) -> Tuple[str, str]:
+        """返回 (缓存文件路径, 缓存 key)，未命中时在图片处理进程池中生成"""
+        if not self._loaded:
+            await self._load()
+        name, exists = await run_in_threadpool(self._lookup, source, width, height, fmt, quality)
+        path = os.path.join(self.directory, name)
+        if name in self._entries and exists:
+            self._touch(name, self._entries[name][0])
+            return path, name
+        await self._flight.do(name, lambda: self._render(source, path, name, width, height, fmt, quality))
+        return path, name
+
+    async def _render(self, source: str, path: str, name: str, width: int, height: int, fmt: str, quality: int):
+        size = await thumbnail_queue.run(resize_image, source, path, width, height, fmt, quality)
+        self._total += size - self._entries.pop(name, (0, 0.0))[0]
+        self._touch(name, size)
+        await run_in_threadpool(remove_files, self._evict(keep=name))
+
+    def _touch(self, name: str, size: int) -> None:
+        """记录一次访问，移到 LRU 末尾"""
+        self._entries[name] = (size, time.monotonic())
+        self._entries.move_to_end(name)
+
+    def _evict(self, keep: Optional[str] = None) -> List[str]:
+        """
+        从最久未使用的条目开始移出索引，直到总大小不超过上限，返回需要删除的文件路径
+        遇到宽限期内访问过的条目即停止（之后的条目都更新），避免删除即将发送的文件
+        """
+        now = time.monotonic()
+        victims = []
+        while self._total > self.max_bytes and self._entries:
+            name, (size, used_at) = next(iter(self._entries.items()))
+            if name == keep or now - used_at < self.grace:
+                break
+            del self._entries[name]
+            self._total -= size
+            victims.append(os.path.join(self.directory, name))
+        return victims
+
+
+resize_cache = ResizeCache(settings.image_resize_cache_dir, settings.image_resize_cache_max_bytes)
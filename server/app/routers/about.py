@@ -3,8 +3,7 @@ import os
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from app.auth import get_current_user
-from app.models import User
+from app.auth import CurrentUser, get_current_user
 
 router = APIRouter(prefix="/about", tags=["about"])
 
@@ -55,7 +54,7 @@ title: "{title}"
 
 
 @router.get("", response_model=AboutResponse)
-async def get_about_content(current_user: User = Depends(get_current_user)):
+async def get_about_content(current_user: CurrentUser = Depends(get_current_user)):
     """获取关于页面内容"""
     if not ABOUT_FILE.exists():
         raise HTTPException(status_code=404, detail="关于页面文件不存在")
@@ -71,7 +70,7 @@ async def get_about_content(current_user: User = Depends(get_current_user)):
 @router.put("")
 async def update_about_content(
     data: AboutContent,
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """更新关于页面内容"""
     try:
@@ -1,10 +1,10 @@
-from datetime import timedelta
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, UploadFile, File
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 import os
-import uuid
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, delete, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from app.database import get_db
@@ -12,13 +12,21 @@ from app.models import User, Post, Category, Tag, Comment
 from app.schemas import (
     Token, UserResponse, PostCreate, PostUpdate, PostResponse,
     CategoryCreate, CategoryResponse, TagCreate, TagResponse,
-    CommentResponse
+    CommentResponse, CommentBulkAction, ImageUploadResponse
 )
 from app.auth import (
-    verify_password, get_password_hash, create_access_token,
-    get_current_active_user
+    verify_password_async, create_access_token,
+    get_current_active_user, CurrentUser
 )
+from app.login_throttle import login_throttle, client_ip
 from app.config import get_settings
+from app.routers.posts import comment_count_subquery
+from app.view_counter import view_counter
+from app.cache import response_cache
+from app.search_index import search_index
+from app.imaging import make_variants
+from app.thumbnail_queue import thumbnail_queue, variant_urls, VARIANT_DIR, VARIANT_FORMATS
+from app.media_store import save_media, UPLOAD_DIR as MEDIA_DIR
 
 settings = get_settings()
 router = APIRouter()
@@ -27,26 +35,38 @@ router = APIRouter()
 # ============ 认证 ============
 @router.post("/auth/login", response_model=Token)
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db)
 ):
-    """管理员登录"""
+    """管理员登录（按 IP 限制尝试次数，密码验证在专用线程池中执行）"""
+    ip = client_ip(request)
+    retry_after = login_throttle.retry_after(ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="登录尝试过于频繁，请稍后再试",
+            headers={"Retry-After": str(retry_after)},
+        )
+    login_throttle.record(ip)
+    
     result = await db.execute(select(User).where(User.username == form_data.username))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    login_throttle.reset(ip)
     access_token = create_access_token(data={"sub": user.username})
     return Token(access_token=access_token)
 
 
 @router.get("/auth/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_active_user)):
+async def get_me(current_user: CurrentUser = Depends(get_current_active_user)):
     """获取当前用户信息"""
     return current_user
 
@@ -55,23 +75,22 @@ async def get_me(current_user: User = Depends(get_current_active_user)):
 @router.get("/posts", response_model=List[PostResponse])
 async def admin_get_posts(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """获取所有文章（包括未发布）"""
+    comment_counts = comment_count_subquery(approved_only=False)
     result = await db.execute(
-        select(Post).options(
+        select(Post, func.coalesce(comment_counts.c.comment_count, 0)).outerjoin(
+            comment_counts, comment_counts.c.post_id == Post.id
+        ).options(
             selectinload(Post.category),
             selectinload(Post.tags),
             selectinload(Post.author),
         ).order_by(Post.created_at.desc())
     )
-    posts = result.scalars().all()
     
     items = []
-    for post in posts:
-        comment_count = await db.execute(
-            select(func.count()).select_from(Comment).where(Comment.post_id == post.id)
-        )
+    for post, comment_count in result.all():
         items.append(PostResponse(
             id=post.id,
             title=post.title,
@@ -81,13 +100,13 @@ async def admin_get_posts(
             cover_image=post.cover_image,
             is_published=post.is_published,
             is_pinned=post.is_pinned,
-            view_count=post.view_count,
+            view_count=post.view_count + view_counter.pending(post.id),
             created_at=post.created_at,
             updated_at=post.updated_at,
             category=post.category,
             tags=post.tags,
             author=post.author,
-            comment_count=comment_count.scalar()
+            comment_count=comment_count
         ))
     return items
 
@@ -96,7 +115,7 @@ async def admin_get_posts(
 async def create_post(
     post: PostCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """创建文章"""
     # 检查 slug 是否重复
@@ -123,7 +142,10 @@ async def create_post(
         tags=tags
     )
     db.add(new_post)
+    await db.flush()
+    await search_index.index_post(db, new_post)
     await db.commit()
+    await response_cache.invalidate("posts")
     await db.refresh(new_post)
     
     # 重新加载关联
@@ -160,7 +182,7 @@ async def update_post(
     post_id: int,
     post_update: PostUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """更新文章"""
     result = await db.execute(
@@ -188,7 +210,9 @@ async def update_post(
     for key, value in update_data.items():
         setattr(post, key, value)
     
+    await search_index.index_post(db, post)
     await db.commit()
+    await response_cache.invalidate("posts")
     await db.refresh(post)
     
     comment_count = await db.execute(
@@ -218,7 +242,7 @@ async def update_post(
 async def delete_post(
     post_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """删除文章"""
     result = await db.execute(select(Post).where(Post.id == post_id))
@@ -227,8 +251,10 @@ async def delete_post(
     if not post:
         raise HTTPException(status_code=404, detail="文章不存在")
     
+    await search_index.remove_post(db, post.id)
     await db.delete(post)
     await db.commit()
+    await response_cache.invalidate("posts")
     return {"message": "文章已删除"}
 
 
@@ -237,7 +263,7 @@ async def delete_post(
 async def create_category(
     category: CategoryCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """创建分类"""
     existing = await db.execute(select(Category).where(Category.slug == category.slug))
@@ -247,6 +273,7 @@ async def create_category(
     new_category = Category(**category.model_dump())
     db.add(new_category)
     await db.commit()
+    await response_cache.invalidate("taxonomy")
     await db.refresh(new_category)
     
     return CategoryResponse(
@@ -262,7 +289,7 @@ async def create_category(
 async def delete_category(
     category_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """删除分类"""
     result = await db.execute(select(Category).where(Category.id == category_id))
@@ -273,6 +300,7 @@ async def delete_category(
     
     await db.delete(category)
     await db.commit()
+    await response_cache.invalidate("taxonomy")
     return {"message": "分类已删除"}
 
 
@@ -281,7 +309,7 @@ async def delete_category(
 async def create_tag(
     tag: TagCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """创建标签"""
     existing = await db.execute(select(Tag).where(Tag.slug == tag.slug))
@@ -291,6 +319,7 @@ async def create_tag(
     new_tag = Tag(**tag.model_dump())
     db.add(new_tag)
     await db.commit()
+    await response_cache.invalidate("taxonomy")
     await db.refresh(new_tag)
     
     return TagResponse(id=new_tag.id, name=new_tag.name, slug=new_tag.slug, post_count=0)
@@ -300,7 +329,7 @@ async def create_tag(
 async def delete_tag(
     tag_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """删除标签"""
     result = await db.execute(select(Tag).where(Tag.id == tag_id))
@@ -311,25 +340,74 @@ async def delete_tag(
     
     await db.delete(tag)
     await db.commit()
+    await response_cache.invalidate("taxonomy")
     return {"message": "标签已删除"}
 
 
 # ============ 评论管理 ============
+def naive_utc(value: datetime) -> datetime:
+    """数据库中保存的是不带时区的 UTC 时间"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def encode_comment_cursor(created_at: datetime, comment_id: int) -> str:
+    """分页游标包含排序键本身，上一页的评论被删除后仍然有效"""
+    return f"{created_at.isoformat()}_{comment_id}"
+
+
+def decode_comment_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, comment_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(comment_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
 @router.get("/comments")
 async def admin_get_comments(
     approved: Optional[bool] = None,
+    post_id: Optional[int] = None,
+    since: Optional[datetime] = Query(None, description="只返回此时间之后的评论"),
+    until: Optional[datetime] = Query(None, description="只返回此时间之前的评论"),
+    limit: int = Query(50, ge=1, le=200, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的 X-Next-Cursor 响应头"),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    """获取所有评论（包含文章信息）"""
-    query = select(Comment).options(selectinload(Comment.post)).order_by(Comment.created_at.desc())
+    """
+    获取评论（包含文章信息），按时间倒序
+    按 (created_at, id) 游标分页，下一页游标通过 X-Next-Cursor 响应头返回
+    """
+    query = (
+        select(
+            Comment.id, Comment.nickname, Comment.email, Comment.website, Comment.content,
+            Comment.is_approved, Comment.created_at, Comment.post_id, Comment.parent_id,
+            Post.title.label("post_title"), Post.slug.label("post_slug"),
+        )
+        .outerjoin(Post, Post.id == Comment.post_id)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .limit(limit + 1)
+    )
     if approved is not None:
         query = query.where(Comment.is_approved == approved)
-    
-    result = await db.execute(query)
-    comments = result.scalars().all()
-    
-    return [{
+    if post_id is not None:
+        query = query.where(Comment.post_id == post_id)
+    if since is not None:
+        query = query.where(Comment.created_at >= naive_utc(since))
+    if until is not None:
+        query = query.where(Comment.created_at < naive_utc(until))
+    if cursor is not None:
+        query = query.where(tuple_(Comment.created_at, Comment.id) < decode_comment_cursor(cursor))
+    
+    rows = (await db.execute(query)).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_comment_cursor(rows[-1].created_at, rows[-1].id)
+    
+    return JSONResponse([{
         "id": c.id,
         "nickname": c.nickname,
         "email": c.email,
@@ -338,17 +416,64 @@ async def admin_get_comments(
         "is_approved": c.is_approved,
         "created_at": c.created_at.isoformat(),
         "post_id": c.post_id,
-        "post_title": c.post.title if c.post else "已删除的文章",
-        "post_slug": c.post.slug if c.post else None,
+        "post_title": c.post_title if c.post_title is not None else "已删除的文章",
+        "post_slug": c.post_slug,
         "parent_id": c.parent_id,
-    } for c in comments]
+    } for c in rows], headers=headers)
+
+
+@router.get("/comments/pending-count")
+async def get_pending_comment_count(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """待审核评论数（只扫描审核状态索引）"""
+    result = await db.execute(
+        select(func.count()).select_from(Comment).where(Comment.is_approved == False)
+    )
+    return {"pending": result.scalar()}
+
+
+@router.post("/comments/bulk-approve")
+async def bulk_approve_comments(
+    action: CommentBulkAction,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """批量审核通过（单条 UPDATE）"""
+    result = await db.execute(
+        update(Comment)
+        .where(Comment.id.in_(action.ids), Comment.is_approved == False)
+        .values(is_approved=True)
+    )
+    await db.commit()
+    await response_cache.invalidate("comments")
+    return {"message": "评论已通过审核", "approved": result.rowcount}
+
+
+@router.post("/comments/bulk-delete")
+async def bulk_delete_comments(
+    action: CommentBulkAction,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """批量删除（单条 DELETE），与单个删除一致，被删评论的回复保留并解除父评论关联"""
+    await db.execute(
+        update(Comment)
+        .where(Comment.parent_id.in_(action.ids), Comment.id.not_in(action.ids))
+        .values(parent_id=None)
+    )
+    result = await db.execute(delete(Comment).where(Comment.id.in_(action.ids)))
+    await db.commit()
+    await response_cache.invalidate("comments")
+    return {"message": "评论已删除", "deleted": result.rowcount}
 
 
 @router.put("/comments/{comment_id}/approve")
 async def approve_comment(
     comment_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """审核通过评论"""
     result = await db.execute(select(Comment).where(Comment.id == comment_id))
@@ -359,6 +484,7 @@ async def approve_comment(
     
     comment.is_approved = True
     await db.commit()
+    await response_cache.invalidate("comments")
     return {"message": "评论已通过审核"}
 
 
@@ -366,7 +492,7 @@ async def approve_comment(
 async def delete_comment(
     comment_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """删除评论"""
     result = await db.execute(select(Comment).where(Comment.id == comment_id))
@@ -377,30 +503,38 @@ async def delete_comment(
     
     await db.delete(comment)
     await db.commit()
+    await response_cache.invalidate("comments")
     return {"message": "评论已删除"}
 # ============= 图片管理 =============
-@router.post("/upload", response_model=dict)
+@router.post("/upload", response_model=ImageUploadResponse)
 async def upload_image(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    """编辑器内图片上传"""
-    # 确保目录存在
-    upload_dir = os.path.join(os.path.dirname(__file__), "..", "..", "uploads", "photos")
-    os.makedirs(upload_dir, exist_ok=True)
-    
+    """编辑器内图片上传（同时生成响应式版本，供前端输出 srcset）"""
     # 检查扩展名
     ext = os.path.splitext(file.filename)[1].lower()
     if ext not in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
         raise HTTPException(status_code=400, detail="不支持的图片格式")
     
-    # 生成唯一文件名
-    filename = f"{uuid.uuid4().hex}{ext}"
-    filepath = os.path.join(upload_dir, filename)
-    
-    # 保存文件
-    with open(filepath, "wb") as f:
-        f.write(await file.read())
+    # 按内容哈希保存，重复上传同一张图片时复用已有文件
+    media, _ = await save_media(db, file, ext)
+    
+    # 在图片处理进程池中生成响应式版本（重复上传时直接复用）
+    if media.variants is None:
+        try:
+            media.variants = variant_urls(await thumbnail_queue.run(
+                make_variants,
+                os.path.join(MEDIA_DIR, os.path.basename(media.url)),
+                VARIANT_DIR,
+                settings.image_variant_widths_list,
+                VARIANT_FORMATS,
+                settings.image_variant_quality,
+            ))
+        except Exception as e:
+            print(f"⚠️ 响应式图片生成失败 {media.url}: {e}")
+    await db.commit()
     
     # 返回 URL
-    return {"url": f"/uploads/photos/{filename}"}
+    return ImageUploadResponse(url=media.url, variants=media.variants or [])
@@ -3,19 +3,22 @@
 支持相册管理和图片上传
 """
 import os
-import uuid
 import shutil
 from typing import Optional, List
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
+from app.schemas import ImageVariant
+from app.cache import response_cache
 from app.models import Album, Photo
 from app.auth import get_current_user
+from app.thumbnail_queue import thumbnail_queue
+from app.media_store import save_media, release_media, remove_files, sweep_media
 
 router = APIRouter(prefix="/api/albums", tags=["相册"])
 
@@ -31,6 +34,12 @@ class PhotoResponse(BaseModel):
     id: int
     url: str
     thumbnail: Optional[str]
+    variants: Optional[List[ImageVariant]] = None  # 响应式图片版本，生成完成前为空
+    # 以下由后台任务回填，用于前端预留布局和显示占位
+    width: Optional[int] = None
+    height: Optional[int] = None
+    color: Optional[str] = None  # 主色调 #rrggbb
+    placeholder: Optional[str] = None  # 模糊占位图 data URI
     title: Optional[str]
     description: Optional[str]
     sort_order: int
@@ -54,6 +63,8 @@ class AlbumResponse(BaseModel):
 
 class AlbumDetailResponse(AlbumResponse):
     photos: List[PhotoResponse] = []
+    page: int = 1
+    page_size: Optional[int] = None  # 为空时返回全部照片
 
 
 class AlbumCreate(BaseModel):
@@ -74,54 +85,100 @@ class AlbumUpdate(BaseModel):
 
 # ========== 公开接口 ==========
 
-@router.get("")
-async def get_albums(db: AsyncSession = Depends(get_db)):
-    """获取所有可见相册"""
-    result = await db.execute(
-        select(Album)
-        .where(Album.is_visible == True)
-        .options(selectinload(Album.photos))
+def album_summary_query():
+    """
+    相册列表查询：照片数和默认封面（排序最靠前的照片）由子查询计算，不加载照片
+    返回 (Album, photo_count, first_photo_url)
+    """
+    photo_counts = (
+        select(Photo.album_id, func.count(Photo.id).label("photo_count"))
+        .group_by(Photo.album_id)
+        .subquery()
+    )
+    first_photo = (
+        select(Photo.url)
+        .where(Photo.album_id == Album.id)
+        .order_by(Photo.sort_order, Photo.id)
+        .limit(1)
+        .correlate(Album)
+        .scalar_subquery()
+    )
+    return (
+        select(Album, func.coalesce(photo_counts.c.photo_count, 0), first_photo)
+        .outerjoin(photo_counts, photo_counts.c.album_id == Album.id)
         .order_by(Album.sort_order)
     )
-    albums = result.scalars().all()
+
+
+def album_to_response(album: Album, photo_count: int, first_photo: Optional[str]) -> AlbumResponse:
+    return AlbumResponse(
+        id=album.id,
+        name=album.name,
+        description=album.description,
+        cover=album.cover or first_photo,
+        sort_order=album.sort_order,
+        is_visible=album.is_visible,
+        photo_count=photo_count
+    )
+
+
+@router.get("")
+async def get_albums(request: Request, db: AsyncSession = Depends(get_db)):
+    """获取所有可见相册"""
+    entry = await response_cache.lookup("albums", ("albums",))
+    if entry.hit:
+        return entry.response(request)
     
-    return [
-        AlbumResponse(
-            id=a.id,
-            name=a.name,
-            description=a.description,
-            cover=a.cover or (a.photos[0].url if a.photos else None),
-            sort_order=a.sort_order,
-            is_visible=a.is_visible,
-            photo_count=len(a.photos)
-        )
-        for a in albums
-    ]
+    result = await db.execute(album_summary_query().where(Album.is_visible == True))
+    
+    await entry.store([album_to_response(*row) for row in result.all()])
+    return entry.response(request)
 
 
 @router.get("/{album_id}")
-async def get_album_detail(album_id: int, db: AsyncSession = Depends(get_db)):
-    """获取相册详情（含照片）"""
-    result = await db.execute(
-        select(Album)
-        .where(Album.id == album_id)
-        .options(selectinload(Album.photos))
+async def get_album_detail(
+    album_id: int,
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: Optional[int] = Query(None, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取相册详情（含照片），传入 page_size 时分页返回照片"""
+    entry = await response_cache.lookup(
+        "albums:detail", ("albums",), album_id=album_id, page=page, page_size=page_size
     )
+    if entry.hit:
+        return entry.response(request)
+    
+    result = await db.execute(select(Album).where(Album.id == album_id))
     album = result.scalar_one_or_none()
     
     if not album:
         raise HTTPException(status_code=404, detail="Album not found")
     
-    return AlbumDetailResponse(
+    photo_count = (await db.execute(
+        select(func.count()).select_from(Photo).where(Photo.album_id == album_id)
+    )).scalar()
+    
+    # 照片在 SQL 中排序（走 album_id + sort_order 索引）
+    photo_query = select(Photo).where(Photo.album_id == album_id).order_by(Photo.sort_order, Photo.id)
+    if page_size is not None:
+        photo_query = photo_query.offset((page - 1) * page_size).limit(page_size)
+    photos = (await db.execute(photo_query)).scalars().all()
+    
+    await entry.store(AlbumDetailResponse(
         id=album.id,
         name=album.name,
         description=album.description,
         cover=album.cover,
         sort_order=album.sort_order,
         is_visible=album.is_visible,
-        photo_count=len(album.photos),
-        photos=[PhotoResponse.model_validate(p) for p in sorted(album.photos, key=lambda x: x.sort_order)]
-    )
+        photo_count=photo_count,
+        photos=[PhotoResponse.model_validate(p) for p in photos],
+        page=page,
+        page_size=page_size
+    ))
+    return entry.response(request)
 
 
 # ========== 管理接口 ==========
@@ -132,25 +189,8 @@ async def get_all_albums(
     _: dict = Depends(get_current_user)
 ):
     """获取所有相册（包括隐藏的）"""
-    result = await db.execute(
-        select(Album)
-        .options(selectinload(Album.photos))
-        .order_by(Album.sort_order)
-    )
-    albums = result.scalars().all()
-    
-    return [
-        AlbumResponse(
-            id=a.id,
-            name=a.name,
-            description=a.description,
-            cover=a.cover or (a.photos[0].url if a.photos else None),
-            sort_order=a.sort_order,
-            is_visible=a.is_visible,
-            photo_count=len(a.photos)
-        )
-        for a in albums
-    ]
+    result = await db.execute(album_summary_query())
+    return [album_to_response(*row) for row in result.all()]
 
 
 @router.post("/admin")
@@ -163,6 +203,7 @@ async def create_album(
     new_album = Album(**album.model_dump())
     db.add(new_album)
     await db.commit()
+    await response_cache.invalidate("albums")
     await db.refresh(new_album)
     return AlbumResponse(
         id=new_album.id,
@@ -193,6 +234,7 @@ async def update_album(
         setattr(db_album, key, value)
     
     await db.commit()
+    await response_cache.invalidate("albums")
     await db.refresh(db_album)
     return {"message": "Album updated"}
 
@@ -210,8 +252,16 @@ async def delete_album(
     if not db_album:
         raise HTTPException(status_code=404, detail="Album not found")
     
+    photos = (await db.execute(select(Photo.id, Photo.url).where(Photo.album_id == album_id))).all()
     await db.delete(db_album)
+    await db.flush()
+    orphaned = []
+    for _, url in photos:
+        orphaned.extend(await release_media(db, url))
     await db.commit()
+    thumbnail_queue.forget([photo_id for photo_id, _ in photos])
+    await run_in_threadpool(remove_files, orphaned)
+    await response_cache.invalidate("albums")
     return {"message": "Album deleted"}
 
 
@@ -224,91 +274,84 @@ async def upload_photos(
     db: AsyncSession = Depends(get_db),
     _: dict = Depends(get_current_user)
 ):
-    """上传照片到相册（自动生成缩略图）"""
-    from PIL import Image
-    import io
-    
-    # 缩略图配置
-    THUMB_SIZE = (400, 400)  # 缩略图最大尺寸
-    THUMB_QUALITY = 85  # JPEG 压缩质量
-    
+    """上传照片到相册（原图保存后立即返回，缩略图在后台生成）"""
     # 检查相册是否存在
     result = await db.execute(select(Album).where(Album.id == album_id))
     album = result.scalar_one_or_none()
     if not album:
         raise HTTPException(status_code=404, detail="Album not found")
     
-    # 确保缩略图目录存在
-    thumb_dir = os.path.join(UPLOAD_DIR, "thumbnails")
-    os.makedirs(thumb_dir, exist_ok=True)
-    
     uploaded = []
+    photos = []
+    new_files = []
     for file in files:
         # 生成唯一文件名
         ext = os.path.splitext(file.filename)[1].lower()
         if ext not in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
             continue
         
-        unique_id = uuid.uuid4().hex
-        filename = f"{unique_id}{ext}"
-        thumb_filename = f"{unique_id}_thumb.jpg"  # 缩略图统一用 jpg
-        
-        filepath = os.path.join(UPLOAD_DIR, filename)
-        thumb_filepath = os.path.join(thumb_dir, thumb_filename)
-        
-        # 读取文件内容
-        content = await file.read()
-        
-        # 保存原图
-        with open(filepath, "wb") as f:
-            f.write(content)
-        
-        # 生成缩略图
+        # 按内容哈希保存原图，相同内容只保存一份
+        # 某个文件失败（如超过大小上限）时回滚，并清理本批新增的文件
         try:
-            img = Image.open(io.BytesIO(content))
-            
-            # 处理 EXIF 旋转
-            try:
-                from PIL import ExifTags
-                for orientation in ExifTags.TAGS.keys():
-                    if ExifTags.TAGS[orientation] == 'Orientation':
-                        break
-                exif = dict(img._getexif().items()) if hasattr(img, '_getexif') and img._getexif() else {}
-                if orientation in exif:
-                    if exif[orientation] == 3:
-                        img = img.rotate(180, expand=True)
-                    elif exif[orientation] == 6:
-                        img = img.rotate(270, expand=True)
-                    elif exif[orientation] == 8:
-                        img = img.rotate(90, expand=True)
-            except:
-                pass
-            
-            # 转换为 RGB（处理 RGBA/P 模式）
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            
-            # 生成缩略图（保持比例）
-            img.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
-            img.save(thumb_filepath, "JPEG", quality=THUMB_QUALITY, optimize=True)
-            
-            thumb_url = f"/uploads/photos/thumbnails/{thumb_filename}"
-        except Exception as e:
-            print(f"Failed to generate thumbnail for {filename}: {e}")
-            thumb_url = None
+            media, created = await save_media(db, file, ext)
+        except Exception:
+            await db.rollback()
+            await run_in_threadpool(remove_files, new_files)
+            raise
+        if created:
+            new_files.append(os.path.join(UPLOAD_DIR, os.path.basename(media.url)))
+        
+        # 已有相同图片的照片时直接复用缩略图、响应式版本和元数据
+        existing = (await db.execute(
+            select(Photo.thumbnail, Photo.variants, Photo.width, Photo.height, Photo.color, Photo.placeholder)
+            .where(Photo.url == media.url, Photo.thumbnail != None, Photo.variants != None)
+            .order_by(Photo.width == None)
+            .limit(1)
+        )).first()
         
-        # 创建数据库记录
+        # 创建数据库记录，缩略图生成后回写
         photo = Photo(
-            url=f"/uploads/photos/{filename}",
-            thumbnail=thumb_url,
+            **(existing._asdict() if existing else {}),
+            url=media.url,
             album_id=album_id,
             title=os.path.splitext(file.filename)[0]
         )
         db.add(photo)
-        uploaded.append(filename)
+        photos.append(photo)
+        uploaded.append(os.path.basename(media.url))
     
     await db.commit()
-    return {"message": f"Uploaded {len(uploaded)} photos", "files": uploaded}
+    await response_cache.invalidate("albums")
+    
+    for photo in photos:
+        if photo.thumbnail is None:
+            thumbnail_queue.submit(photo.id, photo.url)
+        elif photo.width is None:
+            thumbnail_queue.submit(photo.id, photo.url, metadata_only=True)
+    
+    return {
+        "message": f"Uploaded {len(uploaded)} photos",
+        "files": uploaded,
+        "photo_ids": [photo.id for photo in photos],
+    }
+
+
+@router.get("/admin/thumbnails/status")
+async def get_thumbnail_status(
+    photo_ids: Optional[str] = None,
+    _: dict = Depends(get_current_user)
+):
+    """
+    获取缩略图生成任务状态
+    photo_ids 为逗号分隔的照片 ID，不传时返回所有未完成的任务
+    """
+    ids = None
+    if photo_ids:
+        try:
+            ids = [int(photo_id) for photo_id in photo_ids.split(",") if photo_id.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid photo_ids")
+    return thumbnail_queue.status(ids)
 
 
 @router.delete("/admin/photos/{photo_id}")
@@ -324,14 +367,26 @@ async def delete_photo(
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
     
-    # 尝试删除文件
-    try:
-        filepath = os.path.join(UPLOAD_DIR, os.path.basename(photo.url))
-        if os.path.exists(filepath):
-            os.remove(filepath)
-    except:
-        pass
-    
     await db.delete(photo)
+    await db.flush()
+    # 文件可能被其他照片或文章共用，引用归零后才删除
+    orphaned = await release_media(db, photo.url)
     await db.commit()
+    thumbnail_queue.forget([photo_id])
+    await run_in_threadpool(remove_files, orphaned)
+    await response_cache.invalidate("albums")
     return {"message": "Photo deleted"}
+
+
+@router.post("/admin/media/sweep")
+async def sweep_media_files(
+    dry_run: bool = True,
+    grace_hours: int = 24,
+    db: AsyncSession = Depends(get_db),
+    _: dict = Depends(get_current_user)
+):
+    """
+    清理未被引用的上传图片（默认只列出不删除）
+    grace_hours 内修改过的文件会被保留，避免删掉刚上传还未保存到文章的图片
+    """
+    return await sweep_media(db, dry_run=dry_run, grace_seconds=grace_hours * 3600)
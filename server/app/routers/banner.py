@@ -1,16 +1,25 @@
 # Banner 管理接口
+import asyncio
 import os
 import json
+import re
 import shutil
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from PIL import Image
-import io
-from app.auth import get_current_user
-from app.models import User
+from typing import Dict, List, Optional
+from app.auth import CurrentUser, get_current_user
+from app.cache import encode_json
+from app.config import get_settings
+from app.etag import conditional_response, make_etag
+from app.imaging import RESIZE_FORMATS, banner_thumbnail_fresh, can_encode, resize_image
+from app.singleflight import SingleFlight
+from app.thumbnail_queue import thumbnail_queue
+from app.upload_storage import store_upload
+
+settings = get_settings()
 
 router = APIRouter(prefix="/banner", tags=["banner"])
 
@@ -54,52 +63,154 @@ def get_banner_images(directory: Path) -> List[str]:
     return sorted(images)
 
 
-def generate_thumbnail(image_path: Path, device: str) -> Path:
-    """生成缩略图"""
-    thumb_filename = f"{device}_{image_path.name}"
-    thumb_path = THUMBNAIL_DIR / thumb_filename
-    
-    # 如果缩略图已存在且比原图新，直接返回
-    if thumb_path.exists():
-        if thumb_path.stat().st_mtime >= image_path.stat().st_mtime:
-            return thumb_path
-    
+class BannerIndex:
+    """
+    Banner 目录的内存索引
+    每次请求只 stat 两个目录，目录修改时间变化（增删文件）或上传、删除接口显式失效时才重新扫描；
+    序列化好的响应体和 ETag 一并缓存
+    """
+
+    def __init__(self, directories: Dict[str, Path]):
+        self.directories = directories
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._images: Dict[str, List[str]] = {}
+        self._body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+
+    def invalidate(self, device: Optional[str] = None) -> None:
+        """下次访问时重新扫描（device 为空时扫描全部目录）"""
+        if device is None:
+            self._mtimes.clear()
+        else:
+            self._mtimes.pop(device, None)
+
+    def _refresh(self) -> None:
+        changed = False
+        for device, directory in self.directories.items():
+            try:
+                mtime = directory.stat().st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if device in self._mtimes and self._mtimes[device] == mtime:
+                continue
+            self._images[device] = get_banner_images(directory)
+            self._mtimes[device] = mtime
+            changed = True
+        if changed:
+            body = encode_json(self._images)
+            if body != self._body:
+                self._body = body
+                self._etag = make_etag(body)
+
+    def images(self) -> Dict[str, List[str]]:
+        self._refresh()
+        return self._images
+
+    def response(self, request: Request):
+        """返回缓存的响应体，客户端缓存仍有效时返回 304"""
+        self._refresh()
+        return conditional_response(request, self._body, etag=self._etag)
+
+
+banner_index = BannerIndex({"desktop": DESKTOP_BANNER_DIR, "mobile": MOBILE_BANNER_DIR})
+
+
+# 缩略图格式，当前 Pillow 不支持时退回 JPEG
+THUMBNAIL_FORMAT = settings.banner_thumbnail_format.lower()
+if THUMBNAIL_FORMAT not in RESIZE_FORMATS or not can_encode(RESIZE_FORMATS[THUMBNAIL_FORMAT]):
+    print(f"⚠️ 不支持的 Banner 缩略图格式 {THUMBNAIL_FORMAT}，改用 jpeg")
+    THUMBNAIL_FORMAT = "jpeg"
+THUMBNAIL_EXT = "jpg" if THUMBNAIL_FORMAT == "jpeg" else THUMBNAIL_FORMAT
+THUMBNAIL_MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "avif": "image/avif", "png": "image/png"}
+
+_thumbnail_flight = SingleFlight()
+# 预生成任务，保留引用防止被垃圾回收
+_prewarm_tasks: set = set()
+
+
+def thumbnail_path(device: str, filename: str) -> Path:
+    """缩略图文件名包含宽度，修改配置后自动生成新的缩略图"""
+    return THUMBNAIL_DIR / f"{device}_{filename}_{settings.banner_thumbnail_width}w.{THUMBNAIL_EXT}"
+
+
+# 任意宽度和格式的缩略图后缀（修改配置前生成的缩略图也要删除）
+THUMBNAIL_EXTENSIONS = sorted({"jpg" if fmt == "jpeg" else fmt for fmt in RESIZE_FORMATS})
+THUMBNAIL_SUFFIX = rf"_\d+w\.(?:{'|'.join(THUMBNAIL_EXTENSIONS)})"
+
+
+def remove_thumbnails(device: str, filename: str) -> None:
+    """
+    删除原图对应的所有缩略图（包括旧配置生成的和早期不带宽度后缀的）
+    按完整文件名匹配，删除 a.jpg 时不会误删 a.jpg.png 的缩略图
+    """
+    pattern = re.compile(rf"{re.escape(f'{device}_{filename}')}(?:{THUMBNAIL_SUFFIX})?")
+    for path in THUMBNAIL_DIR.iterdir():
+        if pattern.fullmatch(path.name):
+            path.unlink(missing_ok=True)
+
+
+async def _render_thumbnail(image_path: Path, thumb_path: Path) -> None:
+    if await run_in_threadpool(banner_thumbnail_fresh, str(image_path), str(thumb_path)):
+        return
+    await thumbnail_queue.run(
+        resize_image,
+        str(image_path),
+        str(thumb_path),
+        settings.banner_thumbnail_width,
+        0,
+        THUMBNAIL_FORMAT,
+        settings.banner_thumbnail_quality,
+    )
+
+
+async def generate_thumbnail(image_path: Path, device: str) -> Path:
+    """
+    生成缩略图（已存在且不早于原图时直接返回）
+    缩放在图片处理执行器中进行，同一张图片的并发请求只生成一次
+    """
+    thumb_path = thumbnail_path(device, image_path.name)
     try:
-        with Image.open(image_path) as img:
-            # 转换为 RGB（处理 RGBA 等格式）
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            
-            # 缩略图尺寸：宽度 400px，保持比例
-            width = 400
-            ratio = width / img.width
-            height = int(img.height * ratio)
-            
-            img.thumbnail((width, height), Image.Resampling.LANCZOS)
-            img.save(thumb_path, "JPEG", quality=70, optimize=True)
-            
+        await _thumbnail_flight.do(thumb_path, lambda: _render_thumbnail(image_path, thumb_path))
         return thumb_path
     except Exception as e:
-        print(f"生成缩略图失败: {e}")
+        print(f"⚠️ 生成 Banner 缩略图失败 {image_path.name}: {e}")
         return image_path  # 失败时返回原图
 
 
+def prewarm_thumbnails(images: Optional[Dict[str, List[str]]] = None) -> None:
+    """在后台为缺少缩略图的 Banner 预生成缩略图（启动时和上传后调用）"""
+    images = banner_index.images() if images is None else images
+    directories = banner_index.directories
+
+    async def prewarm():
+        await asyncio.gather(*(
+            generate_thumbnail(directories[device] / filename, device)
+            for device, filenames in images.items()
+            for filename in filenames
+        ))
+
+    task = asyncio.create_task(prewarm())
+    _prewarm_tasks.add(task)
+    task.add_done_callback(_prewarm_tasks.discard)
+
+
+async def cancel_prewarm() -> None:
+    """取消未完成的预生成任务（关闭图片处理执行器之前调用）"""
+    for task in _prewarm_tasks:
+        task.cancel()
+    await asyncio.gather(*_prewarm_tasks, return_exceptions=True)
+
+
 @router.get("", response_model=BannerListResponse)
-async def get_banners(current_user: User = Depends(get_current_user)):
+async def get_banners(current_user: CurrentUser = Depends(get_current_user)):
     """获取所有 banner 图片列表（需要登录）"""
-    return BannerListResponse(
-        desktop=get_banner_images(DESKTOP_BANNER_DIR),
-        mobile=get_banner_images(MOBILE_BANNER_DIR)
-    )
+    return BannerListResponse(**banner_index.images())
 
 
 @router.get("/public", response_model=BannerListResponse)
-async def get_public_banners():
-    """获取所有 banner 图片列表（公开接口，供前端使用）"""
-    return BannerListResponse(
-        desktop=get_banner_images(DESKTOP_BANNER_DIR),
-        mobile=get_banner_images(MOBILE_BANNER_DIR)
-    )
+async def get_public_banners(request: Request):
+    """获取所有 banner 图片列表（公开接口，供前端使用，从内存索引返回）"""
+    return banner_index.response(request)
 
 
 @router.get("/thumbnail/{device}/{filename}")
@@ -115,11 +226,12 @@ async def get_banner_thumbnail(device: str, filename: str):
         raise HTTPException(status_code=404, detail="图片不存在")
     
     # 生成或获取缩略图
-    thumb_path = generate_thumbnail(image_path, device)
+    thumb_path = await generate_thumbnail(image_path, device)
+    media_type = THUMBNAIL_MEDIA_TYPES[THUMBNAIL_FORMAT] if thumb_path != image_path else None
     
     return FileResponse(
         thumb_path,
-        media_type="image/jpeg",
+        media_type=media_type,
         headers={"Cache-Control": "public, max-age=86400"}  # 缓存1天
     )
 
@@ -128,7 +240,7 @@ async def get_banner_thumbnail(device: str, filename: str):
 async def upload_banner(
     device: str,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """上传 banner 图片"""
     if device not in ["desktop", "mobile"]:
@@ -141,17 +253,19 @@ async def upload_banner(
     
     target_dir = DESKTOP_BANNER_DIR if device == "desktop" else MOBILE_BANNER_DIR
     
-    # 保存文件
-    file_path = target_dir / file.filename
+    # 分块保存文件（只取文件名部分，防止路径穿越）
+    filename = os.path.basename(file.filename)
+    file_path = target_dir / filename
     try:
-        content = await file.read()
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        await store_upload(file, str(file_path))
+        banner_index.invalidate(device)
         
-        # 预生成缩略图
-        generate_thumbnail(file_path, device)
+        # 后台预生成缩略图
+        prewarm_thumbnails({device: [filename]})
         
-        return {"message": "上传成功", "filename": file.filename}
+        return {"message": "上传成功", "filename": filename}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存失败: {str(e)}")
 
@@ -160,7 +274,7 @@ async def upload_banner(
 async def delete_banner(
     device: str,
     filename: str,
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """删除 banner 图片"""
     if device not in ["desktop", "mobile"]:
@@ -174,11 +288,10 @@ async def delete_banner(
     
     try:
         file_path.unlink()
+        banner_index.invalidate(device)
         
         # 同时删除缩略图
-        thumb_path = THUMBNAIL_DIR / f"{device}_{filename}"
-        if thumb_path.exists():
-            thumb_path.unlink()
+        remove_thumbnails(device, filename)
         
         return {"message": "删除成功"}
     except Exception as e:
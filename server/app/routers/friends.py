@@ -1,11 +1,12 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from datetime import datetime
 
 from app.database import get_db
+from app.cache import response_cache
 from app.models import Friend
 from app.routers.admin import get_current_active_user
 
@@ -41,15 +42,20 @@ class FriendResponse(FriendBase):
 
 # 公开接口 - 获取所有可见友链
 @router.get("/friends", response_model=List[FriendResponse])
-async def get_friends(db: AsyncSession = Depends(get_db)):
+async def get_friends(request: Request, db: AsyncSession = Depends(get_db)):
     """获取所有可见的友情链接"""
+    entry = await response_cache.lookup("friends", ("friends",))
+    if entry.hit:
+        return entry.response(request)
+    
     result = await db.execute(
         select(Friend)
         .where(Friend.is_visible == True)
         .order_by(Friend.sort_order.asc(), Friend.created_at.desc())
     )
     friends = result.scalars().all()
-    return friends
+    await entry.store([FriendResponse.model_validate(f) for f in friends])
+    return entry.response(request)
 
 
 # 管理接口 - 获取所有友链（包括隐藏的）
@@ -85,6 +91,7 @@ async def create_friend(
     )
     db.add(new_friend)
     await db.commit()
+    await response_cache.invalidate("friends")
     await db.refresh(new_friend)
     return new_friend
 
@@ -113,6 +120,7 @@ async def update_friend(
     db_friend.is_visible = friend.is_visible
     
     await db.commit()
+    await response_cache.invalidate("friends")
     await db.refresh(db_friend)
     return db_friend
 
@@ -133,4 +141,5 @@ async def delete_friend(
     
     await db.delete(db_friend)
     await db.commit()
+    await response_cache.invalidate("friends")
     return {"message": "删除成功"}
@@ -1,20 +1,42 @@
+from collections import defaultdict
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from app.database import get_db
-from app.models import Post, Category, Tag, Comment
+from app.cache import response_cache, encode_json
+from app.etag import conditional_response, make_etag
+from app.view_counter import view_counter
+from app.media_store import find_variants
+from app.models import Post, Category, Tag, Comment, post_tags
 from app.schemas import (
     PostResponse, PostListResponse, CategoryResponse, TagResponse,
-    CommentResponse, CommentCreate, PaginatedResponse
+    TaxonomyResponse, CommentResponse, CommentCreate, PaginatedResponse
 )
 
 router = APIRouter()
 
+# 响应缓存依赖的数据标签，写操作按标签失效
+# 浏览量不参与失效：缓存中保存基准值，返回时叠加 view_counter 中的实时增量
+POST_CACHE_TAGS = ("posts", "taxonomy", "comments")
+TAXONOMY_CACHE_TAGS = ("posts", "taxonomy")
+
+
+def comment_count_subquery(approved_only: bool = True):
+    """按文章分组统计评论数的子查询（一次查询得到整页文章的评论数）"""
+    query = select(
+        Comment.post_id,
+        func.count(Comment.id).label("comment_count")
+    ).group_by(Comment.post_id)
+    if approved_only:
+        query = query.where(Comment.is_approved == True)
+    return query.subquery()
+
 
 @router.get("/posts", response_model=PaginatedResponse)
 async def get_posts(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=500),
     category: Optional[str] = None,
@@ -22,7 +44,36 @@ async def get_posts(
     db: AsyncSession = Depends(get_db)
 ):
     """获取已发布的文章列表"""
-    query = select(Post).where(Post.is_published == True).options(
+    entry = await response_cache.lookup(
+        "posts:list", POST_CACHE_TAGS,
+        page=page, page_size=page_size, category=category, tag=tag
+    )
+    if not entry.hit:
+        await entry.store(await list_posts(db, page, page_size, category, tag))
+    
+    # 缓存中保存浏览量基准值，返回时再加上本进程记录的浏览量
+    data = entry.payload()
+    for item in data["items"]:
+        item["view_count"] += view_counter.recorded(item["id"])
+    return conditional_response(request, encode_json(data))
+
+
+async def list_posts(
+    db: AsyncSession,
+    page: int,
+    page_size: int,
+    category: Optional[str],
+    tag: Optional[str],
+) -> PaginatedResponse:
+    """查询一页已发布文章（浏览量为基准值）"""
+    # 评论数通过分组子查询 LEFT JOIN 得到，避免每篇文章单独查询一次
+    comment_counts = comment_count_subquery()
+    query = select(
+        Post,
+        func.coalesce(comment_counts.c.comment_count, 0)
+    ).outerjoin(
+        comment_counts, comment_counts.c.post_id == Post.id
+    ).where(Post.is_published == True).options(
         selectinload(Post.category),
         selectinload(Post.tags),
         selectinload(Post.author),
@@ -50,17 +101,10 @@ async def get_posts(
     offset = (page - 1) * page_size
     query = query.offset(offset).limit(page_size)
     result = await db.execute(query)
-    posts = result.scalars().all()
+    rows = result.all()
     
-    # 获取评论数
     items = []
-    for post in posts:
-        comment_count = await db.execute(
-            select(func.count()).select_from(Comment).where(
-                Comment.post_id == post.id,
-                Comment.is_approved == True
-            )
-        )
+    for post, comment_count in rows:
         post_dict = {
             "id": post.id,
             "title": post.title,
@@ -69,11 +113,11 @@ async def get_posts(
             "cover_image": post.cover_image,
             "is_published": post.is_published,
             "is_pinned": post.is_pinned,
-            "view_count": post.view_count,
+            "view_count": post.view_count - view_counter.flushed(post.id),
             "created_at": post.created_at,
             "category": post.category,
             "tags": post.tags,
-            "comment_count": comment_count.scalar()
+            "comment_count": comment_count
         }
         items.append(PostListResponse(**post_dict))
     
@@ -86,33 +130,8 @@ async def get_posts(
     )
 
 
-@router.get("/posts/{slug}", response_model=PostResponse)
-async def get_post(slug: str, db: AsyncSession = Depends(get_db)):
-    """获取单篇文章详情"""
-    result = await db.execute(
-        select(Post).where(Post.slug == slug, Post.is_published == True).options(
-            selectinload(Post.category),
-            selectinload(Post.tags),
-            selectinload(Post.author),
-        )
-    )
-    post = result.scalar_one_or_none()
-    
-    if not post:
-        raise HTTPException(status_code=404, detail="文章不存在")
-    
-    # 增加浏览量
-    post.view_count += 1
-    await db.commit()
-    
-    # 获取评论数
-    comment_count = await db.execute(
-        select(func.count()).select_from(Comment).where(
-            Comment.post_id == post.id,
-            Comment.is_approved == True
-        )
-    )
-    
+def build_post_response(post: Post, comment_count: int, images: Optional[dict] = None) -> PostResponse:
+    """文章详情响应（浏览量为基准值：数据库中的值减去本进程已写回的部分）"""
     return PostResponse(
         id=post.id,
         title=post.title,
@@ -122,125 +141,212 @@ async def get_post(slug: str, db: AsyncSession = Depends(get_db)):
         cover_image=post.cover_image,
         is_published=post.is_published,
         is_pinned=post.is_pinned,
-        view_count=post.view_count,
+        view_count=post.view_count - view_counter.flushed(post.id),
         created_at=post.created_at,
         updated_at=post.updated_at,
         category=post.category,
         tags=post.tags,
         author=post.author,
-        comment_count=comment_count.scalar()
+        comment_count=comment_count,
+        images=images or {}
     )
 
 
-@router.get("/categories", response_model=List[CategoryResponse])
-async def get_categories(db: AsyncSession = Depends(get_db)):
-    """获取所有分类"""
-    result = await db.execute(select(Category))
-    categories = result.scalars().all()
-    
-    items = []
-    for cat in categories:
-        count = await db.execute(
-            select(func.count()).select_from(Post).where(
-                Post.category_id == cat.id,
-                Post.is_published == True
+@router.get("/posts/{slug}", response_model=PostResponse)
+async def get_post(slug: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """获取单篇文章详情"""
+    entry = await response_cache.lookup("posts:detail", POST_CACHE_TAGS, slug=slug)
+    if not entry.hit:
+        result = await db.execute(
+            select(Post).where(Post.slug == slug, Post.is_published == True).options(
+                selectinload(Post.category),
+                selectinload(Post.tags),
+                selectinload(Post.author),
             )
         )
-        items.append(CategoryResponse(
+        post = result.scalar_one_or_none()
+        
+        if not post:
+            raise HTTPException(status_code=404, detail="文章不存在")
+        
+        # 获取评论数
+        comment_count = await db.execute(
+            select(func.count()).select_from(Comment).where(
+                Comment.post_id == post.id,
+                Comment.is_approved == True
+            )
+        )
+        
+        # 缓存中保存浏览量基准值，返回时再加上本进程记录的浏览量
+        images = await find_variants(db, post.content, post.cover_image)
+        await entry.store(build_post_response(post, comment_count.scalar(), images))
+    
+    data = entry.payload()
+    
+    # 弱 ETag：由除浏览量以外的全部内容计算，分类、标签、作者等关联数据变化时也会更新，
+    # 浏览量的变化不会让客户端重新下载正文。
+    # 关联数据的修改不会更新 posts.updated_at，因此不提供 Last-Modified
+    etag = make_etag(
+        encode_json({key: value for key, value in data.items() if key != "view_count"}), weak=True
+    )
+    
+    # 增加浏览量（先记入内存缓冲，由后台任务批量写回）
+    view_counter.increment(data["id"])
+    data["view_count"] += view_counter.recorded(data["id"])
+    return conditional_response(request, encode_json(data), etag=etag)
+
+
+async def list_categories_with_counts(db: AsyncSession) -> List[CategoryResponse]:
+    """单条 GROUP BY 查询获取所有分类及已发布文章数"""
+    result = await db.execute(
+        select(Category, func.count(Post.id))
+        .outerjoin(Post, and_(Post.category_id == Category.id, Post.is_published == True))
+        .group_by(Category.id)
+        .order_by(Category.id)
+    )
+    return [
+        CategoryResponse(
             id=cat.id,
             name=cat.name,
             slug=cat.slug,
             description=cat.description,
-            post_count=count.scalar()
-        ))
-    return items
+            post_count=count
+        )
+        for cat, count in result.all()
+    ]
 
 
-@router.get("/tags", response_model=List[TagResponse])
-async def get_tags(db: AsyncSession = Depends(get_db)):
-    """获取所有标签"""
-    result = await db.execute(select(Tag))
-    tags = result.scalars().all()
-    
-    items = []
-    for tag in tags:
-        count = await db.execute(
-            select(func.count()).select_from(Post).join(Post.tags).where(
-                Tag.id == tag.id,
-                Post.is_published == True
-            )
-        )
-        items.append(TagResponse(
+async def list_tags_with_counts(db: AsyncSession) -> List[TagResponse]:
+    """单条 GROUP BY 查询获取所有标签及已发布文章数"""
+    result = await db.execute(
+        select(Tag, func.count(Post.id))
+        .outerjoin(post_tags, post_tags.c.tag_id == Tag.id)
+        .outerjoin(Post, and_(Post.id == post_tags.c.post_id, Post.is_published == True))
+        .group_by(Tag.id)
+        .order_by(Tag.id)
+    )
+    return [
+        TagResponse(
             id=tag.id,
             name=tag.name,
             slug=tag.slug,
-            post_count=count.scalar()
+            post_count=count
+        )
+        for tag, count in result.all()
+    ]
+
+
+@router.get("/categories", response_model=List[CategoryResponse])
+async def get_categories(request: Request, db: AsyncSession = Depends(get_db)):
+    """获取所有分类"""
+    entry = await response_cache.lookup("categories", TAXONOMY_CACHE_TAGS)
+    if not entry.hit:
+        await entry.store(await list_categories_with_counts(db))
+    return entry.response(request)
+
+
+@router.get("/tags", response_model=List[TagResponse])
+async def get_tags(request: Request, db: AsyncSession = Depends(get_db)):
+    """获取所有标签"""
+    entry = await response_cache.lookup("tags", TAXONOMY_CACHE_TAGS)
+    if not entry.hit:
+        await entry.store(await list_tags_with_counts(db))
+    return entry.response(request)
+
+
+@router.get("/taxonomy", response_model=TaxonomyResponse)
+async def get_taxonomy(request: Request, db: AsyncSession = Depends(get_db)):
+    """一次获取所有分类和标签（含文章数），供侧边栏使用"""
+    entry = await response_cache.lookup("taxonomy", TAXONOMY_CACHE_TAGS)
+    if not entry.hit:
+        await entry.store(TaxonomyResponse(
+            categories=await list_categories_with_counts(db),
+            tags=await list_tags_with_counts(db)
         ))
-    return items
+    return entry.response(request)
+
+
+def comment_to_response(comment: Comment) -> CommentResponse:
+    """评论 ORM 对象转响应模型（回复列表由调用方填充）"""
+    return CommentResponse(
+        id=comment.id,
+        nickname=comment.nickname,
+        email=comment.email,
+        website=comment.website,
+        content=comment.content,
+        is_approved=comment.is_approved,
+        created_at=comment.created_at,
+        post_id=comment.post_id,
+        parent_id=comment.parent_id,
+        replies=[]
+    )
 
 
 @router.get("/posts/{slug}/comments", response_model=List[CommentResponse])
-async def get_comments(slug: str, db: AsyncSession = Depends(get_db)):
-    """获取文章的已审核评论"""
+async def get_comments(
+    slug: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=100, description="每页顶级评论数，不传则返回全部"),
+    before: Optional[int] = Query(None, description="分页游标：上一页最后一条顶级评论的 ID"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取文章的已审核评论
+    
+    一次查询取出全部已审核评论，在内存中组装评论树；
+    传入 limit 时按顶级评论分页，下一页游标通过 X-Next-Cursor 响应头返回
+    """
     # 先获取文章
-    post_result = await db.execute(select(Post).where(Post.slug == slug))
-    post = post_result.scalar_one_or_none()
-    if not post:
+    post_result = await db.execute(select(Post.id).where(Post.slug == slug))
+    post_id = post_result.scalar_one_or_none()
+    if post_id is None:
         raise HTTPException(status_code=404, detail="文章不存在")
     
-    # 获取顶级评论（没有 parent_id 的）
     result = await db.execute(
         select(Comment).where(
-            Comment.post_id == post.id,
-            Comment.is_approved == True,
-            Comment.parent_id == None
-        ).order_by(Comment.created_at.desc())
+            Comment.post_id == post_id,
+            Comment.is_approved == True
+        ).order_by(Comment.created_at.asc(), Comment.id.asc())
     )
     comments = result.scalars().all()
     
-    # 递归获取回复
-    async def get_replies(comment_id: int):
-        result = await db.execute(
-            select(Comment).where(
-                Comment.parent_id == comment_id,
-                Comment.is_approved == True
-            ).order_by(Comment.created_at.asc())
-        )
-        replies = result.scalars().all()
-        items = []
-        for reply in replies:
-            reply_dict = CommentResponse(
-                id=reply.id,
-                nickname=reply.nickname,
-                email=reply.email,
-                website=reply.website,
-                content=reply.content,
-                is_approved=reply.is_approved,
-                created_at=reply.created_at,
-                post_id=reply.post_id,
-                parent_id=reply.parent_id,
-                replies=await get_replies(reply.id)
-            )
-            items.append(reply_dict)
-        return items
+    # 按父评论分组（回复按时间正序），顶级评论按时间倒序
+    roots = []
+    children = defaultdict(list)
+    for comment in comments:
+        if comment.parent_id is None:
+            roots.append(comment)
+        else:
+            children[comment.parent_id].append(comment)
+    roots.reverse()
+    
+    # 游标分页
+    headers = {}
+    if before is not None:
+        cursor = next((c for c in roots if c.id == before), None)
+        if cursor is not None:
+            roots = [c for c in roots if (c.created_at, c.id) < (cursor.created_at, cursor.id)]
+        else:
+            roots = [c for c in roots if c.id < before]
+    if limit is not None:
+        if len(roots) > limit:
+            headers["X-Next-Cursor"] = str(roots[limit - 1].id)
+        roots = roots[:limit]
     
+    # 迭代组装评论树，未审核评论下的回复不会被展示
     result_comments = []
-    for comment in comments:
-        comment_dict = CommentResponse(
-            id=comment.id,
-            nickname=comment.nickname,
-            email=comment.email,
-            website=comment.website,
-            content=comment.content,
-            is_approved=comment.is_approved,
-            created_at=comment.created_at,
-            post_id=comment.post_id,
-            parent_id=comment.parent_id,
-            replies=await get_replies(comment.id)
-        )
-        result_comments.append(comment_dict)
+    for root in roots:
+        root_response = comment_to_response(root)
+        stack = [(root.id, root_response)]
+        while stack:
+            comment_id, node = stack.pop()
+            for reply in children.get(comment_id, []):
+                reply_response = comment_to_response(reply)
+                node.replies.append(reply_response)
+                stack.append((reply.id, reply_response))
+        result_comments.append(root_response)
     
-    return result_comments
+    return conditional_response(request, encode_json(result_comments), headers=headers)
 
 
 @router.post("/comments", response_model=CommentResponse)
@@ -287,8 +393,22 @@ async def create_comment(comment: CommentCreate, db: AsyncSession = Depends(get_
 
 
 @router.get("/stats")
-async def get_stats(db: AsyncSession = Depends(get_db)):
+async def get_stats(request: Request, db: AsyncSession = Depends(get_db)):
     """获取博客统计信息"""
+    entry = await response_cache.lookup("stats", POST_CACHE_TAGS)
+    if entry.hit:
+        stats = entry.payload()
+    else:
+        stats = await count_stats(db)
+        await entry.store(stats)
+    
+    # 缓存中保存浏览量基准值，返回时再加上本进程记录的浏览量
+    stats["views"] += view_counter.recorded_total()
+    return conditional_response(request, encode_json(stats))
+
+
+async def count_stats(db: AsyncSession) -> dict:
+    """统计文章、分类、标签、评论数和总浏览量（基准值）"""
     posts_count = await db.execute(
         select(func.count()).select_from(Post).where(Post.is_published == True)
     )
@@ -306,23 +426,29 @@ async def get_stats(db: AsyncSession = Depends(get_db)):
         "categories": categories_count.scalar(),
         "tags": tags_count.scalar(),
         "comments": comments_count.scalar(),
-        "views": total_views.scalar() or 0
+        "views": (total_views.scalar() or 0) - view_counter.flushed_total()
     }
 
 
 @router.get("/calendar-data.json")
-async def get_calendar_data(db: AsyncSession = Depends(get_db)):
+async def get_calendar_data(request: Request, db: AsyncSession = Depends(get_db)):
     """获取日历数据（文章发布日期列表）"""
+    entry = await response_cache.lookup("calendar", ("posts",))
+    if entry.hit:
+        return entry.response(request)
+    
     result = await db.execute(
-        select(Post).where(Post.is_published == True).order_by(Post.created_at.desc())
+        select(Post.slug, Post.title, Post.created_at)
+        .where(Post.is_published == True)
+        .order_by(Post.created_at.desc())
     )
-    posts = result.scalars().all()
     
-    return [
+    await entry.store([
         {
-            "id": post.slug,
-            "title": post.title,
-            "date": post.created_at.strftime("%Y-%m-%d")
+            "id": slug,
+            "title": title,
+            "date": created_at.strftime("%Y-%m-%d")
         }
-        for post in posts
-    ]
+        for slug, title, created_at in result.all()
+    ])
+    return entry.response(request)
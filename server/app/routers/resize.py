@@ -0,0 +1,82 @@
+"""
+按需图片缩放
+GET /uploads/resize/{w}x{h}/{path}?fmt=webp&q=80
+path 为 uploads 目录下的相对路径，banner/desktop/... 与 banner/mobile/... 对应 Banner 目录。
+首次请求时缩放并写入磁盘缓存，之后直接返回缓存文件
+"""
+import os
+import re
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from app.config import get_settings
+from app.etag import etag_matches
+from app.imaging import RESIZE_FORMATS, can_encode
+from app.resize_cache import resize_cache
+from app.routers.banner import DESKTOP_BANNER_DIR, MOBILE_BANNER_DIR
+from app.thumbnail_queue import UPLOADS_ROOT
+
+settings = get_settings()
+
+router = APIRouter(prefix="/uploads/resize", tags=["图片缩放"])
+
+SIZE_PATTERN = re.compile(r"^(\d+)x(\d+)$")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif"}
+MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif", "jpeg": "image/jpeg", "png": "image/png"}
+
+# 路径前缀 -> 源文件目录（按顺序匹配）
+SOURCE_ROOTS = [
+    ("banner/desktop/", str(DESKTOP_BANNER_DIR)),
+    ("banner/mobile/", str(MOBILE_BANNER_DIR)),
+    ("", UPLOADS_ROOT),
+]
+
+# 缩放结果会被缓存，浏览器也可以缓存一段时间
+CACHE_CONTROL = "public, max-age=86400"
+
+
+def resolve_source(path: str) -> str:
+    """把请求路径映射为磁盘上的源文件，拒绝目录穿越和非图片文件"""
+    for prefix, root in SOURCE_ROOTS:
+        if path.startswith(prefix):
+            root = os.path.realpath(root)
+            source = os.path.realpath(os.path.join(root, path[len(prefix):]))
+            break
+    if os.path.commonpath([root, source]) != root:
+        raise HTTPException(status_code=404, detail="图片不存在")
+    if os.path.splitext(source)[1].lower() not in IMAGE_EXTENSIONS or not os.path.isfile(source):
+        raise HTTPException(status_code=404, detail="图片不存在")
+    return source
+
+
+@router.get("/{size}/{path:path}")
+async def resize(
+    size: str,
+    path: str,
+    request: Request,
+    fmt: str = "webp",
+    q: int = settings.image_resize_default_quality,
+):
+    """按需缩放图片（尺寸和质量必须在允许列表中）"""
+    match = SIZE_PATTERN.match(size)
+    if not match or (int(match[1]), int(match[2])) not in settings.image_resize_sizes_set:
+        raise HTTPException(status_code=400, detail="不支持的尺寸")
+    if q not in settings.image_resize_qualities_set:
+        raise HTTPException(status_code=400, detail="不支持的压缩质量")
+    fmt = fmt.lower()
+    if fmt not in RESIZE_FORMATS or not can_encode(RESIZE_FORMATS[fmt]):
+        raise HTTPException(status_code=400, detail="不支持的图片格式")
+
+    source = await run_in_threadpool(resolve_source, path)
+    try:
+        cached_path, key = await resize_cache.get(source, int(match[1]), int(match[2]), fmt, q)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 图片缩放失败 {path}: {e}")
+        raise HTTPException(status_code=422, detail="图片无法处理")
+
+    # 缓存 key 包含源文件修改时间和缩放参数，可直接作为 ETag
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(cached_path, media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -1,12 +1,15 @@
 """搜索 API 路由"""
-from typing import List, Optional
+import re
+from typing import List, Optional, Tuple
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy import select, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, defer
 from pydantic import BaseModel
 from app.database import get_db
 from app.models import Post, Category, Tag
+from app.search_index import search_index
+from app.search_tokenizer import highlight_terms
 
 
 router = APIRouter()
@@ -33,13 +36,23 @@ class SearchResponse(BaseModel):
     results: List[SearchResultItem]
 
 
-def extract_excerpt(content: str, keyword: str, max_length: int = 150) -> str:
-    """从内容中提取包含关键词的摘要片段"""
-    keyword_lower = keyword.lower()
+def find_first(content: str, terms: List[str]) -> Tuple[int, int]:
+    """查找最早出现的关键词，返回 (位置, 长度)，未找到时位置为 -1"""
     content_lower = content.lower()
+    best = (-1, 0)
+    for term in terms:
+        pos = content_lower.find(term.lower())
+        if pos != -1 and (best[0] == -1 or pos < best[0]):
+            best = (pos, len(term))
+    return best
+
+
+def extract_excerpt(content: str, keyword: str, max_length: int = 150) -> str:
+    """从内容中提取包含关键词的摘要片段（支持多个关键词和中英文混排）"""
+    terms = highlight_terms(keyword)
     
     # 查找关键词位置
-    pos = content_lower.find(keyword_lower)
+    pos, length = find_first(content, terms)
     
     if pos == -1:
         # 如果没找到关键词，返回开头部分
@@ -47,10 +60,10 @@ def extract_excerpt(content: str, keyword: str, max_length: int = 150) -> str:
     else:
         # 计算摘要的起始和结束位置
         start = max(0, pos - 50)
-        end = min(len(content), pos + len(keyword) + 100)
+        end = min(len(content), pos + length + 100)
         
-        # 尝试从单词边界开始
-        if start > 0:
+        # 起点落在英文单词中间时，尝试从单词边界开始（中文没有空格，无需对齐）
+        if start > 0 and content[start - 1].isascii() and content[start - 1].isalnum():
             # 找到最近的空格或换行
             space_pos = content.rfind(' ', 0, start + 20)
             if space_pos > start - 30:
@@ -64,10 +77,13 @@ def extract_excerpt(content: str, keyword: str, max_length: int = 150) -> str:
         if end < len(content):
             excerpt = excerpt + '...'
     
-    # 高亮关键词（用 <mark> 标签包裹）
-    import re
-    pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-    excerpt = pattern.sub(f'<mark>{keyword}</mark>', excerpt)
+    # 高亮关键词（用 <mark> 标签包裹，保留原文大小写）
+    if terms:
+        pattern = re.compile(
+            "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)),
+            re.IGNORECASE
+        )
+        excerpt = pattern.sub(lambda m: f'<mark>{m.group(0)}</mark>', excerpt)
     
     return excerpt
 
@@ -81,40 +97,34 @@ async def search_posts(
     """
     搜索已发布的文章
     
-    搜索范围包括：标题、摘要、内容、分类名称、标签名称
+    搜索范围包括：标题、摘要、内容，按 bm25 相关度排序
+    支持中英文混合的多个关键词（以空格分隔，需同时命中）
     """
     keyword = q.strip()
     
     if not keyword:
         return SearchResponse(query=keyword, total=0, results=[])
     
-    # 构建搜索查询 - 在标题、摘要、内容中搜索
-    query = select(Post).where(
-        Post.is_published == True,
-        or_(
-            Post.title.ilike(f"%{keyword}%"),
-            Post.summary.ilike(f"%{keyword}%"),
-            Post.content.ilike(f"%{keyword}%"),
-        )
-    ).options(
-        selectinload(Post.category),
-        selectinload(Post.tags),
-    ).order_by(
-        # 标题匹配优先级最高
-        Post.title.ilike(f"%{keyword}%").desc(),
-        Post.created_at.desc()
-    ).limit(limit)
-    
-    result = await db.execute(query)
-    posts = result.scalars().all()
+    # 优先使用全文索引，索引不可用时回退到 LIKE 查询
+    if search_index.available:
+        hits = await search_index.search(db, keyword, limit)
+        excerpts = dict(hits)
+        posts = await load_posts(db, [post_id for post_id, _ in hits])
+    else:
+        posts = await like_search(db, keyword, limit)
+        excerpts = {}
     
     # 构建搜索结果
+    terms = highlight_terms(keyword)
     search_results = []
     for post in posts:
+        if post.id in excerpts:
+            # 摘要片段由索引生成，只命中标题时使用文章摘要（正文未加载，没有摘要时再单独读取开头）
+            excerpt = excerpts[post.id] or post.summary or (await load_content(db, post.id))[:150]
         # 提取包含关键词的摘要
-        if keyword.lower() in post.title.lower():
+        elif find_first(post.title, terms)[0] != -1:
             excerpt = post.summary or extract_excerpt(post.content, keyword)
-        elif post.summary and keyword.lower() in post.summary.lower():
+        elif post.summary and find_first(post.summary, terms)[0] != -1:
             excerpt = extract_excerpt(post.summary, keyword)
         else:
             excerpt = extract_excerpt(post.content, keyword)
@@ -137,3 +147,47 @@ async def search_posts(
         total=len(search_results),
         results=search_results
     )
+
+
+async def load_posts(db: AsyncSession, post_ids: List[int]) -> List[Post]:
+    """按给定 ID 顺序加载已发布文章（摘要片段来自索引，不加载正文）"""
+    if not post_ids:
+        return []
+    result = await db.execute(
+        select(Post).where(Post.id.in_(post_ids), Post.is_published == True).options(
+            defer(Post.content),
+            selectinload(Post.category),
+            selectinload(Post.tags),
+        )
+    )
+    posts = {post.id: post for post in result.scalars().all()}
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+async def load_content(db: AsyncSession, post_id: int) -> str:
+    """读取单篇文章的正文"""
+    result = await db.execute(select(Post.content).where(Post.id == post_id))
+    return result.scalar() or ""
+
+
+async def like_search(db: AsyncSession, keyword: str, limit: int) -> List[Post]:
+    """LIKE 模糊查询（全文索引不可用时使用）"""
+    # 构建搜索查询 - 在标题、摘要、内容中搜索
+    query = select(Post).where(
+        Post.is_published == True,
+        or_(
+            Post.title.ilike(f"%{keyword}%"),
+            Post.summary.ilike(f"%{keyword}%"),
+            Post.content.ilike(f"%{keyword}%"),
+        )
+    ).options(
+        selectinload(Post.category),
+        selectinload(Post.tags),
+    ).order_by(
+        # 标题匹配优先级最高
+        Post.title.ilike(f"%{keyword}%").desc(),
+        Post.created_at.desc()
+    ).limit(limit)
+    
+    result = await db.execute(query)
+    return result.scalars().all()
@@ -3,12 +3,13 @@
 公开接口 + 管理接口
 """
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
+from app.cache import response_cache
 from app.models import Tool
 from app.auth import get_current_user
 
@@ -54,8 +55,12 @@ class ToolResponse(BaseModel):
 # ========== 公开接口 ==========
 
 @router.get("")
-async def get_tools(db: AsyncSession = Depends(get_db)):
+async def get_tools(request: Request, db: AsyncSession = Depends(get_db)):
     """获取所有可见的工具列表（按分类分组）"""
+    entry = await response_cache.lookup("tools", ("tools",))
+    if entry.hit:
+        return entry.response(request)
+    
     result = await db.execute(
         select(Tool)
         .where(Tool.is_visible == True)
@@ -70,7 +75,8 @@ async def get_tools(db: AsyncSession = Depends(get_db)):
             grouped[tool.category] = []
         grouped[tool.category].append(ToolResponse.model_validate(tool))
     
-    return grouped
+    await entry.store(grouped)
+    return entry.response(request)
 
 
 # ========== 管理接口 ==========
@@ -98,6 +104,7 @@ async def create_tool(
     new_tool = Tool(**tool.model_dump())
     db.add(new_tool)
     await db.commit()
+    await response_cache.invalidate("tools")
     await db.refresh(new_tool)
     return ToolResponse.model_validate(new_tool)
 
@@ -120,6 +127,7 @@ async def update_tool(
         setattr(db_tool, key, value)
     
     await db.commit()
+    await response_cache.invalidate("tools")
     await db.refresh(db_tool)
     return ToolResponse.model_validate(db_tool)
 
@@ -139,4 +147,5 @@ async def delete_tool(
     
     await db.delete(db_tool)
     await db.commit()
+    await response_cache.invalidate("tools")
     return {"message": "Tool deleted"}
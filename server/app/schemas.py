@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, Field
 
 
@@ -69,6 +69,12 @@ class TagResponse(TagBase):
         from_attributes = True
 
 
+class TaxonomyResponse(BaseModel):
+    """分类与标签汇总（侧边栏使用）"""
+    categories: List[CategoryResponse]
+    tags: List[TagResponse]
+
+
 # ============ 文章 ============
 class PostBase(BaseModel):
     title: str
@@ -106,6 +112,8 @@ class PostResponse(PostBase):
     tags: List[TagResponse] = []
     author: UserResponse
     comment_count: int = 0
+    # 正文和封面中编辑器图片的响应式版本：{原图 URL: [ImageVariant]}，前端据此生成 srcset
+    images: Dict[str, List["ImageVariant"]] = {}
     
     class Config:
         from_attributes = True
@@ -155,6 +163,11 @@ class CommentResponse(CommentBase):
         from_attributes = True
 
 
+class CommentBulkAction(BaseModel):
+    """批量审核 / 删除评论"""
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
 # ============ 分页 ============
 class PaginatedResponse(BaseModel):
     items: List
@@ -162,3 +175,18 @@ class PaginatedResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+
+
+# ============ 图片 ============
+class ImageVariant(BaseModel):
+    """响应式图片的一个版本，前端按 format 分组生成 <source srcset>"""
+    url: str
+    width: int
+    height: int
+    format: str  # webp / avif
+    size: int  # 字节数
+
+
+class ImageUploadResponse(BaseModel):
+    url: str
+    variants: List[ImageVariant] = []
@@ -0,0 +1,151 @@
+"""
+文章全文检索索引
+基于 SQLite FTS5 虚拟表，索引只包含已发布文章，
+由管理接口在文章创建、更新、删除时同步维护。
+文本先经 search_tokenizer 转换（中日韩文字展开为 bigram）再写入索引，
+摘要片段由 snippet() 生成后还原为原文
+"""
+from typing import List, Optional, Tuple
+from sqlalchemy import text, select
+from sqlalchemy.exc import OperationalError
+from app.database import engine
+from app.models import Post
+from app.search_tokenizer import BigramTokenizer, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE
+
+# bm25 列权重：标题 > 摘要 > 正文
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+# 重建索引时每批写入的文章数
+REBUILD_BATCH_SIZE = 500
+
+# snippet() 返回的最大词数（FTS5 上限为 64，一个中文 bigram 算一个词）
+SNIPPET_TOKENS = 48
+
+# 旧版本的索引表（未分词、以空格拼接分词结果），启动时删除
+LEGACY_TABLES = ("posts_fts", "posts_fts_bigram")
+
+
+class SearchIndex:
+    """文章全文索引（FTS5），不可用时由调用方回退到 LIKE 查询"""
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer or BigramTokenizer()
+        # 索引表名包含分词器名称和索引格式版本，更换分词器后会自动重建
+        self.table = f"posts_fts_{self.tokenizer.name}_v2"
+        self.available = False
+
+    async def setup(self) -> None:
+        """创建 FTS5 虚拟表，与 posts 表不一致时重建索引"""
+        if engine.dialect.name != "sqlite":
+            return
+
+        async with engine.begin() as conn:
+            try:
+                await conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                    f"USING fts5(title, summary, content, tokenize='unicode61 remove_diacritics 2')"
+                ))
+            except OperationalError as e:
+                print(f"⚠️ SQLite 不支持 FTS5，搜索将回退到 LIKE 查询: {e}")
+                return
+            self.available = True
+
+            for legacy in LEGACY_TABLES:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {legacy}"))
+
+            indexed = (await conn.execute(text(f"SELECT count(*) FROM {self.table}"))).scalar()
+            published = (await conn.execute(
+                text("SELECT count(*) FROM posts WHERE is_published = 1")
+            )).scalar()
+            if indexed != published:
+                await self.rebuild(conn)
+                print(f"✅ 已重建全文索引: {published} 篇文章")
+
+    async def rebuild(self, conn) -> None:
+        """从 posts 表分批重建索引"""
+        await conn.execute(text(f"DELETE FROM {self.table}"))
+        result = await conn.stream(
+            select(Post.id, Post.title, Post.summary, Post.content)
+            .where(Post.is_published == True)
+            .execution_options(yield_per=REBUILD_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            rows = [self._document(*row) for row in rows]
+            await conn.execute(self._insert_statement(), rows)
+
+    async def index_post(self, db, post: Post) -> None:
+        """写入或更新单篇文章的索引（未发布的文章会从索引中移除）"""
+        if not self.available:
+            return
+        await self.remove_post(db, post.id)
+        if post.is_published:
+            await db.execute(
+                self._insert_statement(),
+                self._document(post.id, post.title, post.summary, post.content),
+            )
+
+    async def remove_post(self, db, post_id: int) -> None:
+        """从索引中移除文章"""
+        if not self.available:
+            return
+        await db.execute(text(f"DELETE FROM {self.table} WHERE rowid = :id"), {"id": post_id})
+
+    async def search(self, db, keyword: str, limit: int) -> List[Tuple[int, Optional[str]]]:
+        """
+        检索文章，返回按 bm25 相关度排序的 (文章 ID, 摘要片段)
+        摘要片段优先取自摘要，其次正文，已转换为带 <mark> 高亮的原文；只命中标题时为 None
+        """
+        match = self.build_match_query(keyword)
+        if not match:
+            return []
+
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        result = await db.execute(
+            text(
+                f"SELECT rowid, "
+                f"snippet({self.table}, 1, :open, :close, '...', {SNIPPET_TOKENS}), "
+                f"snippet({self.table}, 2, :open, :close, '...', {SNIPPET_TOKENS}) "
+                f"FROM {self.table} WHERE {self.table} MATCH :match "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT :limit"
+            ),
+            {"open": HIGHLIGHT_OPEN, "close": HIGHLIGHT_CLOSE, "match": match, "limit": limit},
+        )
+
+        hits = []
+        for post_id, summary_snippet, content_snippet in result.all():
+            if HIGHLIGHT_OPEN in summary_snippet:
+                excerpt = self.tokenizer.restore(summary_snippet)
+            elif HIGHLIGHT_OPEN in content_snippet:
+                excerpt = self.tokenizer.restore(content_snippet)
+            else:
+                excerpt = None
+            hits.append((post_id, excerpt))
+        return hits
+
+    def build_match_query(self, keyword: str) -> str:
+        """
+        把用户输入转换为 FTS5 查询
+        每个词转为加引号的短语并做前缀匹配，多个词之间为 AND
+        """
+        return " ".join(
+            '"' + " ".join(tokens).replace('"', '""') + '"*'
+            for tokens in self.tokenizer.query_phrases(keyword)
+        )
+
+    def _insert_statement(self):
+        return text(
+            f"INSERT INTO {self.table} (rowid, title, summary, content) "
+            f"VALUES (:id, :title, :summary, :content)"
+        )
+
+    def _document(self, post_id: int, title: str, summary: Optional[str], content: str) -> dict:
+        """转换后的索引文档：中日韩文字展开为 bigram，其余文本原样保留以便 snippet() 还原"""
+        return {
+            "id": post_id,
+            "title": self.tokenizer.index_text(title),
+            "summary": self.tokenizer.index_text(summary),
+            "content": self.tokenizer.index_text(content),
+        }
+
+
+search_index = SearchIndex()
@@ -0,0 +1,129 @@
+"""
+搜索分词器
+拉丁字母/数字按单词切分并转小写，连续的中日韩文字切成重叠的二元组（bigram），
+写入 FTS5 索引时只把中日韩文字段展开为 bigram，其余字符原样保留，因此不依赖 SQLite 的中文分词能力，
+snippet() 生成的摘要片段也能还原为原文
+"""
+import re
+from typing import List, Tuple
+
+# 中日韩文字：假名、CJK 扩展 A、CJK 统一汉字、谚文音节、兼容汉字
+CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+
+TOKEN_PATTERN = re.compile(rf"(?P<cjk>[{CJK_RANGES}]+)|(?P<word>[^\W{CJK_RANGES}]+)")
+CJK_RUN = re.compile(rf"[{CJK_RANGES}]+")
+CJK_CHAR = re.compile(rf"[{CJK_RANGES}]")
+
+# 索引文本中分隔 bigram 的字符，以及 snippet() 的高亮标记。
+# 均为 Unicode Cf 类不可见字符，unicode61 分词器把它们当作分隔符，还原时去掉
+SEPARATOR = "\u2063"
+HIGHLIGHT_OPEN = "\u2064"
+HIGHLIGHT_CLOSE = "\u2062"
+CONTROL_CHARS = re.compile(f"[{SEPARATOR}{HIGHLIGHT_OPEN}{HIGHLIGHT_CLOSE}]")
+
+
+class BigramTokenizer:
+    """
+    二元组分词器
+    可替换为其他实现（如基于词典的中文分词），需提供 name、tokenize、query_phrases、index_text 和 restore
+    """
+
+    name = "bigram"
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        文档分词
+        每段中日韩文字额外保留末尾单字，使单字查询也能以前缀方式命中
+        例: "FastAPI 部署方案" -> ["fastapi", "部署", "署方", "方案", "案"]
+        """
+        tokens = []
+        for match in TOKEN_PATTERN.finditer(text or ""):
+            if match.group("word"):
+                tokens.append(match.group("word").lower())
+            else:
+                run = match.group("cjk")
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+                tokens.append(run[-1])
+        return tokens
+
+    def index_text(self, text: str) -> str:
+        """
+        写入索引的文本：中日韩文字段展开为 tokenize 相同的 bigram（以不可见分隔符隔开），其余字符原样保留。
+        unicode61 对它分词的结果与 tokenize 一致，同时标点和大小写仍在索引中，snippet() 可以还原出原文
+        例: "用FastAPI部署。" -> "⁣用⁣FastAPI⁣部署⁣署⁣。"（⁣ 为分隔符）
+        """
+        def expand(match):
+            run = match.group(0)
+            tokens = [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+            return SEPARATOR + SEPARATOR.join(tokens) + SEPARATOR
+
+        return CJK_RUN.sub(expand, CONTROL_CHARS.sub("", text or ""))
+
+    def restore(self, snippet: str) -> str:
+        """
+        把 snippet() 返回的索引文本片段还原为原文，高亮标记转换为 <mark>
+        同一文字段中相邻的 bigram 首尾重叠，只输出不重叠的部分；命中的 bigram 两个字都高亮
+        """
+        chars: List[Tuple[str, bool]] = []
+        highlighted = False
+        previous = None  # 当前文字段中上一个 bigram
+        pattern = re.compile(rf"[{CJK_RANGES}]+|[{HIGHLIGHT_OPEN}{HIGHLIGHT_CLOSE}{SEPARATOR}]|.", re.S)
+        for match in pattern.finditer(snippet):
+            piece = match.group(0)
+            if piece == HIGHLIGHT_OPEN:
+                highlighted = True
+            elif piece == HIGHLIGHT_CLOSE:
+                highlighted = False
+            elif piece == SEPARATOR:
+                continue
+            elif CJK_CHAR.match(piece):
+                if previous is not None and previous[1] == piece[0]:
+                    # 与上一个 bigram 重叠的字已经输出
+                    if highlighted:
+                        chars[-1] = (chars[-1][0], True)
+                    chars.extend((char, highlighted) for char in piece[1:])
+                else:
+                    chars.extend((char, highlighted) for char in piece)
+                # 单字是文字段的结尾
+                previous = piece if len(piece) == 2 else None
+            else:
+                chars.append((piece, highlighted))
+                previous = None
+
+        result = []
+        marked = False
+        for char, is_highlighted in chars:
+            if is_highlighted != marked:
+                result.append("<mark>" if is_highlighted else "</mark>")
+                marked = is_highlighted
+            result.append(char)
+        if marked:
+            result.append("</mark>")
+        return "".join(result)
+
+    def query_phrases(self, keyword: str) -> List[List[str]]:
+        """
+        查询分词，每个以空白分隔的词生成一个短语（短语内的词在文档中必须相邻）
+        查询中的中日韩文字只切 bigram，不加末尾单字
+        例: "FastAPI部署 教程" -> [["fastapi", "部署"], ["教程"]]
+        """
+        phrases = []
+        for term in keyword.split():
+            tokens = []
+            for match in TOKEN_PATTERN.finditer(term):
+                if match.group("word"):
+                    tokens.append(match.group("word").lower())
+                else:
+                    run = match.group("cjk")
+                    if len(run) == 1:
+                        tokens.append(run)
+                    else:
+                        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if tokens:
+                phrases.append(tokens)
+        return phrases
+
+
+def highlight_terms(keyword: str) -> List[str]:
+    """提取用于高亮的原文片段：拉丁单词和完整的中日韩文字段"""
+    return [match.group(0) for match in TOKEN_PATTERN.finditer(keyword)]
@@ -0,0 +1,30 @@
+"""
+请求合并（single-flight）
+同一个 key 的并发调用只执行一次，其余调用方等待并共享同一个结果，
+用于避免突发的相同请求重复执行开销大的操作（图片缩放、外部 API 请求等）
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """按 key 合并并发执行的协程"""
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 func() 并返回结果；同一 key 已有执行中的调用时直接等待它的结果
+        某个调用方被取消不会取消共享的任务
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """是否有该 key 正在执行的调用"""
+        return key in self._tasks
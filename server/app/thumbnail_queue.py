@@ -0,0 +1,259 @@
+"""
+相册缩略图生成队列
+上传接口只保存原图并写入数据库，缩略图和响应式版本由后台任务放到进程池中生成，
+完成后回写 Photo.thumbnail / Photo.variants 以及宽高、主色调、占位图，避免图片解码、缩放阻塞事件循环。
+任务按原图 URL 合并：内容相同的多张照片（同批或并发上传）只生成一次，结果写入所有照片，
+避免两个任务同时写同一组输出文件。
+队列只保存在内存中，重启后会重新为缺少缩略图、响应式版本或元数据的照片排队
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import select, update, or_
+from app.cache import response_cache
+from app.config import get_settings
+from app.database import async_session
+from app.imaging import process_photo, read_photo_metadata, supported_formats
+from app.models import Photo
+
+settings = get_settings()
+
+# 与 main.py 中 /uploads 静态文件服务对应的目录
+UPLOADS_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+THUMB_DIR = os.path.join(UPLOADS_ROOT, "photos", "thumbnails")
+VARIANT_DIR = os.path.join(UPLOADS_ROOT, "photos", "variants")
+VARIANT_URL_PREFIX = "/uploads/photos/variants/"
+
+# 当前 Pillow 支持的响应式图片格式
+VARIANT_FORMATS = supported_formats(settings.image_variant_formats_list)
+
+# 失败状态保留的时间和数量上限，超出后不再出现在状态查询中
+FAILED_TTL_SECONDS = 3600
+FAILED_MAX_ENTRIES = 1000
+
+
+def variant_urls(variants: List[dict]) -> List[dict]:
+    """把生成结果中的文件名转换为 URL：[{url, width, height, format, size}]"""
+    return [
+        {
+            "url": VARIANT_URL_PREFIX + variant["file"],
+            "width": variant["width"],
+            "height": variant["height"],
+            "format": variant["format"],
+            "size": variant["size"],
+        }
+        for variant in variants
+    ]
+
+
+def thumbnail_paths(photo_url: str) -> tuple:
+    """根据原图 URL 得到 (原图路径, 缩略图路径, 缩略图 URL)"""
+    name = os.path.splitext(os.path.basename(photo_url))[0]
+    source_path = os.path.join(UPLOADS_ROOT, photo_url.removeprefix("/uploads/"))
+    thumb_filename = f"{name}_thumb.jpg"  # 缩略图统一用 jpg
+    return (
+        source_path,
+        os.path.join(THUMB_DIR, thumb_filename),
+        f"/uploads/photos/thumbnails/{thumb_filename}",
+    )
+
+
+class ThumbnailQueue:
+    """缩略图任务队列，固定数量的后台任务从队列取任务交给执行器"""
+
+    def __init__(self, workers: int, use_processes: bool = True):
+        self.workers = max(1, workers)
+        self.use_processes = use_processes
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[Executor] = None
+        self._tasks: List[asyncio.Task] = []
+        # 照片 ID -> queued / processing / failed，完成后移除
+        self._jobs: Dict[int, str] = {}
+        # 失败的照片 ID -> 失败时间，按时间排序，过期或超出上限时从 _jobs 中移除
+        self._failed: "OrderedDict[int, float]" = OrderedDict()
+        # 原图 URL -> {photo_ids, metadata_only, started}，每个 URL 同时只有一个任务
+        self._groups: Dict[str, dict] = {}
+
+    def submit(self, photo_id: int, photo_url: str, metadata_only: bool = False) -> None:
+        """
+        为照片排队生成缩略图，metadata_only 时只读取元数据（缩略图已存在的旧照片）
+        同一原图已有任务时并入该任务：排队中的任务需要时升级为完整生成；
+        正在只读取元数据的任务完成后再按完整生成重新排队
+        """
+        if self._queue is None:
+            raise RuntimeError("缩略图队列未启动")
+        group = self._groups.get(photo_url)
+        if group is None:
+            group = {"photo_ids": [], "metadata_only": metadata_only, "started": False}
+            self._groups[photo_url] = group
+            self._queue.put_nowait(photo_url)
+        else:
+            group["metadata_only"] = group["metadata_only"] and metadata_only
+        group["photo_ids"].append(photo_id)
+        self._failed.pop(photo_id, None)
+        self._jobs[photo_id] = "processing" if group["started"] else "queued"
+
+    def forget(self, photo_ids: List[int]) -> None:
+        """照片删除后移除其任务状态，尚未开始的任务不再为它写入结果"""
+        removed = set(photo_ids)
+        for photo_id in removed:
+            self._jobs.pop(photo_id, None)
+            self._failed.pop(photo_id, None)
+        for group in self._groups.values():
+            group["photo_ids"] = [photo_id for photo_id in group["photo_ids"] if photo_id not in removed]
+
+    def _mark_failed(self, photo_ids: List[int]) -> None:
+        now = time.monotonic()
+        for photo_id in photo_ids:
+            self._jobs[photo_id] = "failed"
+            self._failed[photo_id] = now
+            self._failed.move_to_end(photo_id)
+        self._prune_failed()
+
+    def _prune_failed(self) -> None:
+        cutoff = time.monotonic() - FAILED_TTL_SECONDS
+        while self._failed:
+            photo_id, failed_at = next(iter(self._failed.items()))
+            if failed_at >= cutoff and len(self._failed) <= FAILED_MAX_ENTRIES:
+                break
+            del self._failed[photo_id]
+            self._jobs.pop(photo_id, None)
+
+    def status(self, photo_ids: Optional[List[int]] = None) -> dict:
+        """获取未完成任务的状态，不在列表中的照片表示缩略图已生成（或失败已超过保留时间）"""
+        self._prune_failed()
+        jobs = self._jobs if photo_ids is None else {
+            photo_id: self._jobs[photo_id] for photo_id in photo_ids if photo_id in self._jobs
+        }
+        counts = {"queued": 0, "processing": 0, "failed": 0}
+        for state in jobs.values():
+            counts[state] += 1
+        return {
+            **counts,
+            "jobs": [{"photo_id": photo_id, "status": state} for photo_id, state in jobs.items()],
+        }
+
+    async def _process(self, photo_url: str) -> None:
+        group = self._groups[photo_url]
+        if not group["photo_ids"]:
+            # 照片已全部删除
+            del self._groups[photo_url]
+            return
+        group["started"] = True
+        metadata_only = group["metadata_only"]
+        for photo_id in group["photo_ids"]:
+            self._jobs[photo_id] = "processing"
+        source_path, thumb_path, thumb_url = thumbnail_paths(photo_url)
+        try:
+            if metadata_only:
+                values = await self.run(read_photo_metadata, source_path)
+            else:
+                result = await self.run(
+                    process_photo,
+                    source_path,
+                    thumb_path,
+                    (settings.thumbnail_size, settings.thumbnail_size),
+                    settings.thumbnail_quality,
+                    VARIANT_DIR,
+                    settings.image_variant_widths_list,
+                    VARIANT_FORMATS,
+                    settings.image_variant_quality,
+                )
+                values = {**result, "thumbnail": thumb_url, "variants": variant_urls(result["variants"])}
+
+            if metadata_only and not group["metadata_only"]:
+                # 执行期间有照片需要完整生成
+                group["started"] = False
+                for photo_id in group["photo_ids"]:
+                    self._jobs[photo_id] = "queued"
+                self._queue.put_nowait(photo_url)
+                return
+
+            # 写入期间并入的照片在下一轮写入
+            written = set()
+            while True:
+                photo_ids = [photo_id for photo_id in group["photo_ids"] if photo_id not in written]
+                if not photo_ids:
+                    break
+                written.update(photo_ids)
+                async with async_session() as db:
+                    await db.execute(update(Photo).where(Photo.id.in_(photo_ids)).values(**values))
+                    await db.commit()
+        except Exception as e:
+            self._mark_failed(group["photo_ids"])
+            del self._groups[photo_url]
+            print(f"⚠️ 缩略图生成失败 {photo_url}: {e}")
+            return
+
+        for photo_id in group["photo_ids"]:
+            self._jobs.pop(photo_id, None)
+        del self._groups[photo_url]
+        await response_cache.invalidate("albums")
+
+    async def run(self, func: Callable, *args) -> Any:
+        """在图片处理执行器中运行同步函数（编辑器上传等需要等待结果的场景）"""
+        if self._executor is None:
+            raise RuntimeError("缩略图队列未启动")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _run(self):
+        while True:
+            photo_url = await self._queue.get()
+            try:
+                await self._process(photo_url)
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        """启动执行器和后台任务，并为缺少缩略图或元数据的照片重新排队"""
+        if self._tasks:
+            return
+        os.makedirs(THUMB_DIR, exist_ok=True)
+        os.makedirs(VARIANT_DIR, exist_ok=True)
+        self._queue = asyncio.Queue()
+        if self.use_processes:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbnail")
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+        async with async_session() as db:
+            result = await db.execute(
+                select(Photo.id, Photo.url, Photo.thumbnail, Photo.variants)
+                .where(or_(Photo.thumbnail == None, Photo.variants == None, Photo.width == None))
+            )
+            missing = [
+                (photo_id, photo_url, thumbnail is not None and variants is not None)
+                for photo_id, photo_url, thumbnail, variants in result.all()
+                if photo_url and os.path.exists(thumbnail_paths(photo_url)[0])
+            ]
+        for photo_id, photo_url, metadata_only in missing:
+            self.submit(photo_id, photo_url, metadata_only)
+        if missing:
+            backfill = sum(1 for *_, metadata_only in missing if metadata_only)
+            print(f"ℹ️ {len(missing) - backfill} 张照片缺少缩略图或响应式版本，{backfill} 张缺少元数据，已重新排队")
+
+    async def join(self) -> None:
+        """等待队列中的任务全部完成"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """停止后台任务，未完成的任务在下次启动时重新排队"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._queue = None
+        self._jobs.clear()
+        self._failed.clear()
+        self._groups.clear()
+
+
+thumbnail_queue = ThumbnailQueue(settings.thumbnail_workers, settings.thumbnail_use_processes)
@@ -0,0 +1,58 @@
+"""
+上传文件落盘
+按固定大小分块读取上传内容，边写临时文件边计算 SHA-256 并检查大小上限，
+写完后原子替换到目标位置，不会把整个文件读入内存，也不会留下写了一半的文件
+"""
+import hashlib
+import os
+import tempfile
+from typing import NamedTuple, Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def store_upload(file: UploadFile, dest_path: str, max_bytes: Optional[int] = None) -> StoredUpload:
+    """
+    把上传文件流式写入 dest_path
+    超过大小上限时返回 413 并删除临时文件
+    """
+    max_bytes = max_bytes or settings.upload_max_bytes
+    dest_dir = os.path.dirname(dest_path)
+    os.makedirs(dest_dir, exist_ok=True)
+
+    # 临时文件与目标在同一目录，保证 os.replace 是原子的
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await file.read(settings.upload_chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"文件过大，最大 {max_bytes / 1024 / 1024:.1f}MB",
+                    )
+                hasher.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    return StoredUpload(dest_path, size, hasher.hexdigest())
@@ -0,0 +1,123 @@
+"""
+文章浏览量写回缓冲
+阅读时只在内存中累加增量，由后台任务定时批量写回数据库，
+避免每次浏览都触发一次 SQLite 写事务
+"""
+import asyncio
+from typing import Dict, Optional
+from sqlalchemy import update, bindparam
+from app.config import get_settings
+from app.database import async_session
+from app.models import Post
+
+settings = get_settings()
+
+posts_table = Post.__table__
+
+
+class ViewCounter:
+    """按文章 ID 累积浏览量增量，定时及关闭时批量写回"""
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, int] = {}
+        # 正在写回但尚未提交的增量，读取时仍需计入
+        self._flushing: Dict[int, int] = {}
+        # 本进程启动以来已提交到数据库的增量
+        self._flushed: Dict[int, int] = {}
+        self._flushed_total = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def increment(self, post_id: int, delta: int = 1) -> None:
+        """记录一次浏览"""
+        self._pending[post_id] = self._pending.get(post_id, 0) + delta
+
+    def pending(self, post_id: int) -> int:
+        """获取尚未写入数据库的浏览量"""
+        return self._pending.get(post_id, 0) + self._flushing.get(post_id, 0)
+
+    def pending_total(self) -> int:
+        """获取所有文章尚未写入数据库的浏览量之和"""
+        return sum(self._pending.values()) + sum(self._flushing.values())
+
+    def flushed(self, post_id: int) -> int:
+        """获取本进程已写入数据库的浏览量"""
+        return self._flushed.get(post_id, 0)
+
+    def flushed_total(self) -> int:
+        return self._flushed_total
+
+    def recorded(self, post_id: int) -> int:
+        """
+        获取本进程记录的全部浏览量（已写回和未写回）
+        缓存中保存"数据库中的值 - flushed()"，返回时加上 recorded()，写回前后结果一致，
+        因此写回后不需要让缓存失效（多进程共享缓存时，其他进程的浏览量在缓存过期后体现）
+        """
+        return self.flushed(post_id) + self.pending(post_id)
+
+    def recorded_total(self) -> int:
+        return self._flushed_total + self.pending_total()
+
+    async def flush(self) -> int:
+        """将累积的增量写回数据库，返回写回的文章数"""
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            self._flushing, self._pending = self._pending, {}
+            params = [
+                {"post_id": post_id, "delta": delta}
+                for post_id, delta in self._flushing.items()
+            ]
+            try:
+                async with async_session() as db:
+                    # 单个事务内 executemany，一次写锁完成整批更新
+                    # 显式保留 updated_at（否则 onupdate 会刷新它），浏览量变化不改变文章的 updated_at 和 ETag
+                    await db.execute(
+                        update(posts_table)
+                        .where(posts_table.c.id == bindparam("post_id"))
+                        .values(
+                            view_count=posts_table.c.view_count + bindparam("delta"),
+                            updated_at=posts_table.c.updated_at,
+                        ),
+                        params,
+                    )
+                    await db.commit()
+                for post_id, delta in self._flushing.items():
+                    self._flushed[post_id] = self._flushed.get(post_id, 0) + delta
+                    self._flushed_total += delta
+            except Exception as e:
+                # 写回失败时把增量放回，等待下次重试
+                for post_id, delta in self._flushing.items():
+                    self.increment(post_id, delta)
+                print(f"⚠️ 浏览量写回失败: {e}")
+                return 0
+            finally:
+                self._flushing = {}
+
+            return len(params)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """启动定时写回任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止定时任务，并写回剩余增量"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+view_counter = ViewCounter(settings.view_count_flush_interval)
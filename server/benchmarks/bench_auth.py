@@ -0,0 +1,84 @@
+"""
+认证开销基准测试
+在临时 SQLite 数据库中创建管理员，对比关闭/开启认证缓存时 get_current_user 每次调用的耗时和 SQL 查询次数，
+并验证修改用户后缓存失效
+运行方法: python benchmarks/bench_auth.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 blog.db
+TMP_DIR = tempfile.mkdtemp(prefix="bench_auth_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+os.environ["DEBUG"] = "false"
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, select
+from app.auth import create_access_token, get_current_user, user_cache
+from app.database import engine, async_session, init_db
+from app.models import User
+
+REQUESTS = 2000
+# 模拟后台页面同时发出的请求数
+CONCURRENCY = 8
+
+
+async def authenticate(token: str) -> None:
+    async with async_session() as db:
+        await get_current_user(token=token, db=db)
+
+
+async def run(token: str) -> float:
+    """并发执行 REQUESTS 次认证，返回每次的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(REQUESTS // CONCURRENCY):
+        await asyncio.gather(*(authenticate(token) for _ in range(CONCURRENCY)))
+    return (time.perf_counter() - start) / REQUESTS * 1_000_000
+
+
+async def main():
+    await init_db()
+    async with async_session() as db:
+        db.add(User(username="bench", password_hash="x"))
+        await db.commit()
+    token = create_access_token({"sub": "bench"})
+
+    query_count = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_queries(conn, cursor, statement, parameters, context, executemany):
+        nonlocal query_count
+        query_count += 1
+
+    print("=" * 50)
+    print(f"🔐 get_current_user 基准测试 ({REQUESTS} 次，并发 {CONCURRENCY})")
+    print("=" * 50)
+    print(f"{'cache':>10} {'queries':>10} {'us/req':>10}")
+
+    ttl = user_cache.ttl
+    for label, cache_ttl in (("off", 0), ("on", ttl)):
+        user_cache.ttl = cache_ttl
+        user_cache.clear()
+        query_count = 0
+        per_request = await run(token)
+        print(f"{label:>10} {query_count:>10} {per_request:>10.1f}")
+
+    # 修改用户后缓存应失效
+    async with async_session() as db:
+        user = (await db.execute(select(User).where(User.username == "bench"))).scalar_one()
+        user.is_active = False
+        await db.commit()
+    async with async_session() as db:
+        current = await get_current_user(token=token, db=db)
+    print(f"\n修改用户后 is_active = {current.is_active}（应为 False）")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+文章列表接口查询次数基准测试
+在临时 SQLite 数据库中生成文章和评论，统计 GET /api/posts 在不同 page_size 下的 SQL 查询次数与耗时
+运行方法: python benchmarks/bench_post_list.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 blog.db
+TMP_DIR = tempfile.mkdtemp(prefix="bench_posts_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+os.environ["DEBUG"] = "false"
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from starlette.requests import Request
+from app.database import engine, async_session, init_db
+from app.models import User, Category, Tag, Post, Comment
+from app.routers.posts import get_posts
+
+POST_COUNT = 500
+COMMENTS_PER_POST = 3
+PAGE_SIZES = [10, 50, 100, 500]
+
+
+async def seed():
+    """生成测试数据"""
+    async with async_session() as db:
+        user = User(username="bench", password_hash="x")
+        category = Category(name="基准", slug="bench")
+        tags = [Tag(name=f"标签{i}", slug=f"tag-{i}") for i in range(5)]
+        db.add_all([user, category, *tags])
+        await db.flush()
+
+        for i in range(POST_COUNT):
+            post = Post(
+                title=f"文章 {i}",
+                slug=f"post-{i}",
+                content="内容 " * 50,
+                is_published=True,
+                category_id=category.id,
+                author_id=user.id,
+                tags=[tags[i % len(tags)]],
+            )
+            post.comments = [
+                Comment(nickname=f"访客{j}", content="评论", is_approved=j % 2 == 0)
+                for j in range(COMMENTS_PER_POST)
+            ]
+            db.add(post)
+        await db.commit()
+
+
+async def main():
+    await init_db()
+    await seed()
+
+    query_count = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_queries(conn, cursor, statement, parameters, context, executemany):
+        nonlocal query_count
+        query_count += 1
+
+    print("=" * 50)
+    print(f"📊 GET /api/posts 基准测试 ({POST_COUNT} 篇文章)")
+    print("=" * 50)
+    print(f"{'page_size':>10} {'queries':>10} {'ms':>10}")
+
+    for page_size in PAGE_SIZES:
+        async with async_session() as db:
+            query_count = 0
+            start = time.perf_counter()
+            request = Request({"type": "http", "method": "GET", "path": "/api/posts", "headers": []})
+            await get_posts(request, page=1, page_size=page_size, category=None, tag=None, db=db)
+            elapsed = (time.perf_counter() - start) * 1000
+        print(f"{page_size:>10} {query_count:>10} {elapsed:>10.1f}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
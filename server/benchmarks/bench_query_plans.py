@@ -0,0 +1,137 @@
+"""
+热点查询执行计划基准测试
+在临时 SQLite 数据库中生成数据，分别在删除 / 补建 models.py 中为热点查询新增的索引时
+打印热点查询的 EXPLAIN QUERY PLAN 与平均耗时
+运行方法: python benchmarks/bench_query_plans.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 blog.db
+TMP_DIR = tempfile.mkdtemp(prefix="bench_plans_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+os.environ["DEBUG"] = "false"
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select, text
+from app.database import engine, async_session, init_db, create_missing_indexes
+from app.models import User, Tag, Post, Comment, Album, Photo, post_tags
+
+POST_COUNT = 5000
+COMMENTS_PER_POST = 10
+TAG_COUNT = 20
+ALBUM_COUNT = 50
+PHOTOS_PER_ALBUM = 200
+REPEAT = 50
+
+HOT_QUERIES = {
+    "文章列表": select(Post.id)
+        .where(Post.is_published == True)
+        .order_by(Post.is_pinned.desc(), Post.created_at.desc())
+        .limit(10),
+    "标签文章": select(Post.id)
+        .join(post_tags, post_tags.c.post_id == Post.id)
+        .where(post_tags.c.tag_id == 3, Post.is_published == True)
+        .order_by(Post.is_pinned.desc(), Post.created_at.desc())
+        .limit(10),
+    "评论树": select(Comment.id)
+        .where(Comment.post_id == POST_COUNT // 2, Comment.is_approved == True)
+        .order_by(Comment.created_at.asc(), Comment.id.asc()),
+    "评论计数": select(Comment.post_id, Comment.id)
+        .where(Comment.post_id.in_(range(1, 11)), Comment.is_approved == True),
+    "相册照片": select(Photo.id)
+        .where(Photo.album_id == ALBUM_COUNT // 2)
+        .order_by(Photo.sort_order),
+    "后台评论": select(Comment.id)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .limit(50),
+}
+
+
+# 为热点查询新增的索引（删除后模拟旧版本数据库）
+NEW_INDEXES = (
+    "ix_posts_published_pinned_created",
+    "ix_post_tags_tag_id",
+    "ix_comments_post_approved_created",
+    "ix_comments_approved_created",
+    "ix_comments_parent_id",
+    "ix_photos_album_sort",
+    "ix_comments_created",
+)
+
+
+async def seed():
+    """生成测试数据"""
+    async with async_session() as db:
+        db.add(User(username="bench", password_hash="x"))
+        await db.execute(insert(Tag), [{"name": f"标签{i}", "slug": f"tag-{i}"} for i in range(TAG_COUNT)])
+        await db.execute(insert(Post), [
+            {"title": f"文章 {i}", "slug": f"post-{i}", "content": "内容", "author_id": 1,
+             "is_published": i % 5 != 0, "is_pinned": i % 100 == 0}
+            for i in range(POST_COUNT)
+        ])
+        await db.execute(insert(post_tags), [
+            {"post_id": i + 1, "tag_id": i % TAG_COUNT + 1} for i in range(POST_COUNT)
+        ])
+        await db.execute(insert(Comment), [
+            {"nickname": "访客", "content": "评论", "post_id": i % POST_COUNT + 1, "is_approved": i % 3 != 0}
+            for i in range(POST_COUNT * COMMENTS_PER_POST)
+        ])
+        await db.execute(insert(Album), [{"name": f"相册 {i}"} for i in range(ALBUM_COUNT)])
+        await db.execute(insert(Photo), [
+            {"url": f"/uploads/{i}.jpg", "album_id": i % ALBUM_COUNT + 1, "sort_order": (i * 7) % PHOTOS_PER_ALBUM}
+            for i in range(ALBUM_COUNT * PHOTOS_PER_ALBUM)
+        ])
+        await db.commit()
+
+
+async def report(title: str):
+    """打印每个热点查询的执行计划和平均耗时"""
+    print(f"\n----- {title} -----")
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+        for name, query in HOT_QUERIES.items():
+            sql = str(query.compile(engine.sync_engine, compile_kwargs={"literal_binds": True}))
+            plan = (await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).all()
+
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                (await conn.execute(text(sql))).all()
+            elapsed = (time.perf_counter() - start) * 1000 / REPEAT
+
+            print(f"{name}  {elapsed:.3f} ms")
+            for row in plan:
+                print(f"    {row[-1]}")
+
+
+async def main():
+    await init_db()
+    await seed()
+
+    print("=" * 50)
+    print(f"🔎 热点查询执行计划（{POST_COUNT} 篇文章，{POST_COUNT * COMMENTS_PER_POST} 条评论，"
+          f"{ALBUM_COUNT * PHOTOS_PER_ALBUM} 张照片）")
+    print("=" * 50)
+
+    async with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        await conn.execute(text("DROP TABLE IF EXISTS sqlite_stat1"))
+    await report("旧版本数据库（无新增索引）")
+
+    # 与旧数据库升级时相同的补建流程
+    async with engine.begin() as conn:
+        created = await conn.run_sync(create_missing_indexes)
+    print(f"\n补建索引: {', '.join(created)}")
+    await report("补建索引后")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+搜索接口基准测试
+对比不同文章数量下 FTS5 全文索引与 LIKE 模糊查询的耗时
+运行方法: python benchmarks/bench_search.py
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 blog.db
+TMP_DIR = tempfile.mkdtemp(prefix="bench_search_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+os.environ["DEBUG"] = "false"
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app.database import engine, async_session, init_db
+from app.models import User, Post
+from app.search_index import search_index
+from app.routers.search import like_search
+
+CORPUS_SIZES = [1000, 5000, 20000]
+QUERIES = ["w41017", "w12345 w45678", "w49999"]
+ROUNDS = 20
+# 模拟词表：每个词只出现在少量文章中，接近真实文章的词频分布
+WORDS = [f"w{i}" for i in range(50000)]
+
+
+def random_body(rng: random.Random, length: int = 400) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+async def seed(count: int, start: int, rng: random.Random):
+    """追加生成文章"""
+    async with async_session() as db:
+        await db.execute(insert(Post), [
+            {
+                "title": f"post {i} {rng.choice(WORDS)}",
+                "slug": f"post-{i}",
+                "content": random_body(rng),
+                "is_published": True,
+                "author_id": 1,
+            }
+            for i in range(start, start + count)
+        ])
+        await db.commit()
+
+
+async def timed(func) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for q in QUERIES:
+            await func(q)
+    return (time.perf_counter() - start) * 1000 / (ROUNDS * len(QUERIES))
+
+
+async def main():
+    await init_db()
+    await search_index.setup()
+    async with async_session() as db:
+        db.add(User(username="bench", password_hash="x"))
+        await db.commit()
+
+    print("=" * 50)
+    print("🔍 搜索基准测试（每次查询平均耗时 ms）")
+    print("=" * 50)
+    print(f"{'posts':>8} {'fts5':>10} {'like':>10}")
+
+    rng = random.Random(42)
+    total = 0
+    for size in CORPUS_SIZES:
+        await seed(size - total, total, rng)
+        total = size
+        async with engine.begin() as conn:
+            await search_index.rebuild(conn)
+
+        async with async_session() as db:
+            fts_ms = await timed(lambda q: search_index.search(db, q, 10))
+            like_ms = await timed(lambda q: like_search(db, q, 10))
+        print(f"{size:>8} {fts_ms:>10.2f} {like_ms:>10.2f}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
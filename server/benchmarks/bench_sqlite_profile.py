@@ -0,0 +1,113 @@
+"""
+SQLite 性能参数基准测试
+分别使用 SQLite 默认设置（NullPool）和 app/database.py 中的性能参数及连接池，
+在并发读（按 slug 读取文章）+ 并发写（评论写入）下对比吞吐量
+运行方法: python benchmarks/bench_sqlite_profile.py
+"""
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ["DEBUG"] = "false"
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.database import Base, sqlite_pragmas, install_sqlite_pragmas, engine_options
+from app.models import User, Post, Comment
+
+POST_COUNT = 2000
+READERS = 8
+WRITERS = 2
+DURATION = 3.0  # 每轮运行秒数
+ROUNDS = 4  # 两种配置交替运行的轮数，取中位数以减少噪声
+
+
+async def run_profile(pragmas) -> tuple:
+    db_dir = tempfile.mkdtemp(prefix="bench_sqlite_")
+    db_path = os.path.join(db_dir, "bench.db")
+    url = f"sqlite+aiosqlite:///{db_path}"
+    engine = create_async_engine(url, **(engine_options(url) if pragmas else {}))
+    install_sqlite_pragmas(engine, pragmas)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as db:
+        db.add(User(username="bench", password_hash="x"))
+        await db.flush()
+        await db.execute(insert(Post), [
+            {"title": f"post {i}", "slug": f"post-{i}", "content": "内容 " * 200,
+             "is_published": True, "author_id": 1}
+            for i in range(POST_COUNT)
+        ])
+        await db.commit()
+
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + DURATION
+
+    async def reader(worker: int):
+        nonlocal reads, errors
+        while time.perf_counter() < deadline:
+            try:
+                async with session_factory() as db:
+                    result = await db.execute(
+                        select(Post).where(Post.slug == f"post-{(reads * 7 + worker) % POST_COUNT}")
+                    )
+                    result.scalar_one()
+                reads += 1
+            except OperationalError:
+                errors += 1
+
+    async def writer(worker: int):
+        nonlocal writes, errors
+        while time.perf_counter() < deadline:
+            try:
+                async with session_factory() as db:
+                    db.add(Comment(nickname=f"w{worker}", content="评论", post_id=1 + writes % POST_COUNT))
+                    await db.commit()
+                writes += 1
+            except OperationalError:
+                errors += 1
+
+    await asyncio.gather(
+        *(reader(i) for i in range(READERS)),
+        *(writer(i) for i in range(WRITERS)),
+    )
+    await engine.dispose()
+    shutil.rmtree(db_dir, ignore_errors=True)
+    return reads / DURATION, writes / DURATION, errors
+
+
+async def main():
+    print("=" * 50)
+    print(f"🗄️ SQLite 参数对比（{READERS} 读 + {WRITERS} 写，{ROUNDS} 轮 x {DURATION:.0f}s）")
+    print("=" * 50)
+    profiles = {"default": [], "tuned": sqlite_pragmas()}
+    results = {name: [] for name in profiles}
+    for round_no in range(ROUNDS):
+        # 每轮交换运行顺序，抵消先后顺序带来的偏差
+        order = list(profiles.items())
+        if round_no % 2:
+            order.reverse()
+        for name, pragmas in order:
+            results[name].append(await run_profile(pragmas))
+
+    print(f"{'profile':>10} {'reads/s':>12} {'writes/s':>12} {'errors':>8}")
+    for name, runs in results.items():
+        reads = statistics.median(r[0] for r in runs)
+        writes = statistics.median(r[1] for r in runs)
+        errors = sum(r[2] for r in runs)
+        print(f"{name:>10} {reads:>12.0f} {writes:>12.0f} {errors:>8}")
+    print("\n" + "\n".join(sqlite_pragmas()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
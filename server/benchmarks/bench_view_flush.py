@@ -0,0 +1,90 @@
+"""
+浏览量写回基准测试
+在临时 SQLite 数据库中生成文章，记录浏览后测量批量写回的耗时，
+并验证写回不改变文章的 updated_at 和 ETag（否则客户端缓存的正文会全部失效）
+运行方法: python benchmarks/bench_view_flush.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 使用临时数据库，避免污染 blog.db
+TMP_DIR = tempfile.mkdtemp(prefix="bench_views_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+os.environ["DEBUG"] = "false"
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from starlette.requests import Request
+from app.cache import response_cache
+from app.database import engine, async_session, init_db
+from app.models import User, Post
+from app.routers.posts import get_post
+from app.view_counter import view_counter
+
+POST_COUNT = 2000
+VIEWS_PER_POST = 5
+
+
+async def seed():
+    """生成测试数据"""
+    async with async_session() as db:
+        user = User(username="bench", password_hash="x")
+        db.add(user)
+        await db.flush()
+        db.add_all(
+            Post(title=f"文章 {i}", slug=f"post-{i}", content="内容 " * 50, is_published=True, author_id=user.id)
+            for i in range(POST_COUNT)
+        )
+        await db.commit()
+
+
+async def fetch_post(slug: str):
+    """绕过响应缓存获取文章详情，返回 ETag"""
+    await response_cache.invalidate("posts")
+    async with async_session() as db:
+        request = Request({"type": "http", "method": "GET", "path": f"/api/posts/{slug}", "headers": []})
+        response = await get_post(slug, request, db=db)
+    return response.headers["etag"]
+
+
+async def updated_at_values() -> list:
+    async with async_session() as db:
+        return (await db.execute(select(Post.updated_at).order_by(Post.id))).scalars().all()
+
+
+async def main():
+    await init_db()
+    await seed()
+
+    print("=" * 50)
+    print(f"👁 浏览量写回基准测试 ({POST_COUNT} 篇文章，每篇 {VIEWS_PER_POST} 次浏览)")
+    print("=" * 50)
+
+    before = await fetch_post("post-0")
+    updated_before = await updated_at_values()
+
+    async with async_session() as db:
+        post_ids = (await db.execute(select(Post.id))).scalars().all()
+    for post_id in post_ids:
+        view_counter.increment(post_id, VIEWS_PER_POST)
+
+    start = time.perf_counter()
+    flushed = await view_counter.flush()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"写回 {flushed} 篇文章，耗时 {elapsed:.1f} ms")
+
+    after = await fetch_post("post-0")
+    updated_after = await updated_at_values()
+    print(f"\nupdated_at 未变化: {updated_before == updated_after}（应为 True）")
+    print(f"ETag 未变化: {before == after}（应为 True）")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,121 +1,258 @@
 """
-为现有照片生成缩略图的一次性脚本
-运行方法: python generate_thumbnails.py
+批量生成相册缩略图和响应式版本
+使用进程池并行处理；manifest 记录每张原图的内容哈希和生成参数的哈希，
+重复运行时只处理新增、内容变化、参数变化或输出缺失的图片，
+并在同一次运行中批量更新数据库中的缩略图、响应式版本和宽高、主色调、占位图
+manifest 保存在数据库文件所在目录（不在 /uploads 静态目录下）
+运行方法: python generate_thumbnails.py [--workers N] [--force] [--dry-run] [--db-only]
 """
+import argparse
+import asyncio
+import hashlib
+import json
 import os
+import shutil
 import sys
-from PIL import Image, ExifTags
-
-# 配置
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads", "photos")
-THUMB_DIR = os.path.join(UPLOAD_DIR, "thumbnails")
-THUMB_SIZE = (400, 400)
-THUMB_QUALITY = 85
-
-# 确保目录存在
-os.makedirs(THUMB_DIR, exist_ok=True)
-
-def generate_thumbnail(filepath):
-    """为单张图片生成缩略图"""
-    filename = os.path.basename(filepath)
-    name, ext = os.path.splitext(filename)
-    thumb_filename = f"{name}_thumb.jpg"
-    thumb_path = os.path.join(THUMB_DIR, thumb_filename)
-    
-    # 跳过已存在的缩略图
-    if os.path.exists(thumb_path):
-        print(f"  跳过 (已存在): {thumb_filename}")
-        return thumb_filename
-    
-    try:
-        img = Image.open(filepath)
-        
-        # 处理 EXIF 旋转
-        try:
-            for orientation in ExifTags.TAGS.keys():
-                if ExifTags.TAGS[orientation] == 'Orientation':
-                    break
-            exif = dict(img._getexif().items()) if hasattr(img, '_getexif') and img._getexif() else {}
-            if orientation in exif:
-                if exif[orientation] == 3:
-                    img = img.rotate(180, expand=True)
-                elif exif[orientation] == 6:
-                    img = img.rotate(270, expand=True)
-                elif exif[orientation] == 8:
-                    img = img.rotate(90, expand=True)
-        except:
-            pass
-        
-        # 转换为 RGB
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        
-        # 生成缩略图
-        img.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
-        img.save(thumb_path, "JPEG", quality=THUMB_QUALITY, optimize=True)
-        
-        # 计算压缩比
-        original_size = os.path.getsize(filepath)
-        thumb_size = os.path.getsize(thumb_path)
-        ratio = (1 - thumb_size / original_size) * 100
-        
-        print(f"  ✅ {filename}: {original_size/1024:.1f}KB → {thumb_size/1024:.1f}KB ({ratio:.1f}% 压缩)")
-        return thumb_filename
-        
-    except Exception as e:
-        print(f"  ❌ 失败: {filename} - {e}")
-        return None
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.engine import make_url
+from app.config import get_settings
+from app.database import async_session, init_db
+from app.imaging import process_photo
+from app.models import Photo
+from app.thumbnail_queue import UPLOADS_ROOT, THUMB_DIR, VARIANT_DIR, VARIANT_FORMATS, thumbnail_paths, variant_urls
+
+settings = get_settings()
+
+# 写入数据库的照片元数据（同时保存在 manifest 中）
+METADATA_FIELDS = ("width", "height", "color", "placeholder")
+
+UPLOAD_DIR = os.path.join(UPLOADS_ROOT, "photos")
+
+
+def data_dir() -> str:
+    """数据库文件所在目录（Docker 中为 data volume）；非 SQLite 文件数据库时使用项目目录"""
+    url = make_url(settings.database_url)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        return os.path.dirname(os.path.abspath(url.database))
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+# manifest 包含所有原图的文件名和内容哈希，不能放在 /uploads 静态目录下
+MANIFEST_PATH = os.path.join(data_dir(), ".thumbnails-manifest.json")
+# 旧版本保存在静态目录中的 manifest，读取时迁移
+LEGACY_MANIFEST_PATH = os.path.join(UPLOAD_DIR, ".thumbnails-manifest.json")
+EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+# manifest 格式版本，生成逻辑变化时递增以强制全部重建
+MANIFEST_VERSION = 2
+
+
+def settings_hash() -> str:
+    """影响输出结果的参数，任何一项变化都需要重新生成"""
+    params = {
+        "version": MANIFEST_VERSION,
+        "thumbnail_size": settings.thumbnail_size,
+        "thumbnail_quality": settings.thumbnail_quality,
+        "variant_widths": settings.image_variant_widths_list,
+        "variant_formats": VARIANT_FORMATS,
+        "variant_quality": settings.image_variant_quality,
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def file_hash(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def outputs_exist(filename: str, entry: dict) -> bool:
+    """manifest 中记录的输出文件是否都还在"""
+    thumb_path = thumbnail_paths(f"/uploads/photos/{filename}")[1]
+    return os.path.exists(thumb_path) and all(
+        os.path.exists(os.path.join(VARIANT_DIR, variant["file"])) for variant in entry["variants"]
+    )
+
+
+def build(filename: str, previous_hash: str, force: bool) -> dict:
+    """
+    在工作进程中执行：计算原图哈希，内容未变且不强制时跳过生成
+    返回 manifest 条目，skipped 表示沿用已有输出
+    """
+    source_path = os.path.join(UPLOAD_DIR, filename)
+    stat = os.stat(source_path)
+    digest = file_hash(source_path)
+    entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "source": digest, "settings": settings_hash()}
+    if digest == previous_hash and not force:
+        return {**entry, "skipped": True}
+
+    thumb_path = thumbnail_paths(f"/uploads/photos/{filename}")[1]
+    result = process_photo(
+        source_path,
+        thumb_path,
+        (settings.thumbnail_size, settings.thumbnail_size),
+        settings.thumbnail_quality,
+        VARIANT_DIR,
+        settings.image_variant_widths_list,
+        VARIANT_FORMATS,
+        settings.image_variant_quality,
+    )
+    return {**entry, **result, "skipped": False}
+
+
+def load_manifest() -> dict:
+    if os.path.exists(LEGACY_MANIFEST_PATH):
+        if os.path.exists(MANIFEST_PATH):
+            os.remove(LEGACY_MANIFEST_PATH)
+        else:
+            shutil.move(LEGACY_MANIFEST_PATH, MANIFEST_PATH)
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict) -> None:
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def find_stale(photos: list, manifest: dict, force: bool) -> list:
+    """
+    找出需要交给工作进程的图片
+    大小、修改时间、参数都与 manifest 一致且输出齐全的直接跳过，不再读取原图计算哈希
+    """
+    current = settings_hash()
+    stale = []
+    for filename in photos:
+        entry = manifest.get(filename)
+        stat = os.stat(os.path.join(UPLOAD_DIR, filename))
+        if (
+            not force and entry
+            and entry["settings"] == current
+            and entry["size"] == stat.st_size
+            and entry["mtime"] == stat.st_mtime_ns
+            and outputs_exist(filename, entry)
+        ):
+            continue
+        # 参数变化或输出缺失时即使内容相同也必须重新生成
+        reusable = entry and entry["settings"] == current and outputs_exist(filename, entry)
+        stale.append((filename, entry["source"] if reusable else None))
+    return stale
+
+
+async def update_database(manifest: dict) -> int:
+    """把 manifest 中的缩略图和响应式版本批量写回数据库，只更新有变化的照片"""
+    await init_db()
+    async with async_session() as db:
+        columns = [getattr(Photo, field) for field in ("thumbnail", "variants", *METADATA_FIELDS)]
+        result = await db.execute(select(Photo.id, Photo.url, *columns))
+        params = []
+        for row in result.mappings().all():
+            url = row["url"] or ""
+            entry = manifest.get(os.path.basename(url))
+            if not entry or not url.startswith("/uploads/photos/"):
+                continue
+            values = {
+                "thumbnail": thumbnail_paths(url)[2],
+                "variants": variant_urls(entry["variants"]),
+                # 旧版本 manifest 的条目没有元数据，保留数据库中的值
+                **{field: entry.get(field, row[field]) for field in METADATA_FIELDS},
+            }
+            if any(row[key] != value for key, value in values.items()):
+                params.append({"photo_id": row["id"], **values})
+
+        if params:
+            # 单个事务内 executemany
+            await db.execute(
+                update(Photo.__table__)
+                .where(Photo.__table__.c.id == bindparam("photo_id"))
+                .values({key: bindparam(key) for key in ("thumbnail", "variants", *METADATA_FIELDS)}),
+                params,
+            )
+            await db.commit()
+    return len(params)
+
 
 def main():
+    parser = argparse.ArgumentParser(description="批量生成相册缩略图和响应式版本")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数")
+    parser.add_argument("--force", action="store_true", help="忽略 manifest，全部重新生成")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要处理的图片")
+    parser.add_argument("--db-only", action="store_true", help="不生成图片，只按 manifest 更新数据库")
+    args = parser.parse_args()
+
     print("=" * 50)
-    print("📷 为现有照片生成缩略图")
+    print("📷 批量生成缩略图和响应式版本")
     print("=" * 50)
-    
-    # 获取所有图片文件
-    extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
-    photos = [
-        f for f in os.listdir(UPLOAD_DIR) 
-        if os.path.isfile(os.path.join(UPLOAD_DIR, f)) 
-        and os.path.splitext(f)[1].lower() in extensions
-    ]
-    
-    print(f"\n找到 {len(photos)} 张照片\n")
-    
-    success = 0
-    for photo in photos:
-        filepath = os.path.join(UPLOAD_DIR, photo)
-        if generate_thumbnail(filepath):
-            success += 1
-    
-    print(f"\n✅ 完成！成功生成 {success}/{len(photos)} 个缩略图")
+
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    os.makedirs(VARIANT_DIR, exist_ok=True)
+    manifest = load_manifest()
+
+    if not args.db_only:
+        photos = sorted(
+            f for f in os.listdir(UPLOAD_DIR)
+            if os.path.isfile(os.path.join(UPLOAD_DIR, f))
+            and os.path.splitext(f)[1].lower() in EXTENSIONS
+        )
+        stale = find_stale(photos, manifest, args.force)
+        print(f"\n找到 {len(photos)} 张照片，需要检查 {len(stale)} 张（参数哈希 {settings_hash()}）\n")
+
+        if args.dry_run:
+            for filename, _ in stale:
+                print(f"  {filename}")
+            return
+
+        generated = skipped = failed = 0
+        input_bytes = 0
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {pool.submit(build, filename, previous, args.force): filename for filename, previous in stale}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"  ❌ 失败: {filename} - {e}")
+                    continue
+                if entry.pop("skipped"):
+                    # 内容未变（只是修改时间变化），沿用原有输出
+                    previous = manifest[filename]
+                    entry.update({key: previous[key] for key in ("variants", *METADATA_FIELDS)})
+                    skipped += 1
+                else:
+                    generated += 1
+                    input_bytes += entry["size"]
+                    print(f"  ✅ {filename}: {len(entry['variants'])} 个响应式版本")
+                manifest[filename] = entry
+        elapsed = time.perf_counter() - start
+
+        # 删除已不存在的原图的记录
+        for filename in set(manifest) - set(photos):
+            del manifest[filename]
+        save_manifest(manifest)
+
+        print(f"\n生成 {generated}，内容未变 {skipped}，失败 {failed}，耗时 {elapsed:.2f}s")
+        if generated and elapsed > 0:
+            print(f"⚡ 吞吐量: {generated / elapsed:.1f} 张/s，{input_bytes / 1024 / 1024 / elapsed:.1f} MB/s"
+                  f"（{args.workers} 个进程）")
+
+    updated = asyncio.run(update_database(manifest))
+    print(f"\n✅ 数据库已更新 {updated} 张照片的缩略图、响应式版本和元数据")
     print(f"📁 缩略图目录: {THUMB_DIR}")
-    
-    # 提示更新数据库
-    print("\n" + "=" * 50)
-    print("⚠️  请运行以下命令更新数据库中的缩略图路径:")
-    print("=" * 50)
-    print("""
-    在 Python 中执行:
-    
-    import asyncio
-    from app.database import async_session
-    from app.models import Photo
-    from sqlalchemy import select, update
-    import os
-    
-    async def update_thumbnails():
-        async with async_session() as db:
-            result = await db.execute(select(Photo))
-            photos = result.scalars().all()
-            for photo in photos:
-                if photo.url:
-                    name = os.path.splitext(os.path.basename(photo.url))[0]
-                    photo.thumbnail = f"/uploads/photos/thumbnails/{name}_thumb.jpg"
-            await db.commit()
-            print(f"Updated {len(photos)} photos")
-    
-    asyncio.run(update_thumbnails())
-    """)
+
 
 if __name__ == "__main__":
     main()
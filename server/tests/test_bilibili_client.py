@@ -0,0 +1,137 @@
+"""
+BilibiliClient 测试
+上游由 httpx.MockTransport 模拟，不访问 B 站
+"""
+import asyncio
+import httpx
+from app.bilibili_client import BilibiliClient
+from app.database import engine, init_db
+
+
+class FakeUpstream:
+    """模拟收藏夹接口，记录请求次数；可切换数据版本或模拟故障"""
+
+    def __init__(self, total: int = 3):
+        self.total = total
+        self.version = 1
+        self.failing = False
+        self.calls = 0
+        # 设置后请求会等待该事件，用于制造并发
+        self.gate = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.failing:
+            return httpx.Response(500)
+        page = int(request.url.params["pn"])
+        size = int(request.url.params["ps"])
+        start = (page - 1) * size
+        medias = [
+            {"id": i, "title": f"视频 {i} v{self.version}", "bvid": f"BV{i}", "upper": {"name": "up"}}
+            for i in range(start, min(start + size, self.total))
+        ]
+        return httpx.Response(200, json={
+            "code": 0,
+            "data": {"medias": medias, "info": {"media_count": self.total}},
+        })
+
+
+def make_client(upstream: FakeUpstream, **options) -> BilibiliClient:
+    params = dict(ttl=60, stale_ttl=60, timeout=5, max_connections=4, max_entries=100)
+    params.update(options)
+    return BilibiliClient(transport=httpx.MockTransport(upstream), **params)
+
+
+def test_cache_hit_within_ttl():
+    async def run():
+        upstream = FakeUpstream()
+        client = make_client(upstream)
+        await client.start()
+        try:
+            first = await client.get_favorites("1", 1, 20)
+            second = await client.get_favorites("1", 1, 20)
+        finally:
+            await client.stop()
+        return upstream.calls, first, second
+
+    calls, first, second = asyncio.run(run())
+    assert calls == 1
+    assert first == second
+    assert first["total"] == 3
+
+
+def test_stale_while_revalidate():
+    async def run():
+        upstream = FakeUpstream()
+        client = make_client(upstream, ttl=0.05, stale_ttl=60)
+        await client.start()
+        try:
+            await client.get_favorites("1", 1, 20)
+            await asyncio.sleep(0.1)
+            upstream.version = 2
+            # 已过期但在 stale_ttl 内：立即返回旧数据，后台刷新
+            stale = await client.get_favorites("1", 1, 20)
+            await asyncio.gather(*client._refreshing)
+            fresh = await client.get_favorites("1", 1, 20)
+        finally:
+            await client.stop()
+        return upstream.calls, stale, fresh
+
+    calls, stale, fresh = asyncio.run(run())
+    assert calls == 2
+    assert stale["items"][0]["title"].endswith("v1")
+    assert fresh["items"][0]["title"].endswith("v2")
+
+
+def test_concurrent_requests_coalesced():
+    async def run():
+        upstream = FakeUpstream()
+        upstream.gate = asyncio.Event()
+        client = make_client(upstream)
+        await client.start()
+        try:
+            requests = [asyncio.create_task(client.get_favorites("1", 1, 20)) for _ in range(10)]
+            await asyncio.sleep(0.05)
+            upstream.gate.set()
+            results = await asyncio.gather(*requests)
+        finally:
+            await client.stop()
+        return upstream.calls, results
+
+    calls, results = asyncio.run(run())
+    assert calls == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_snapshot_fallback_when_upstream_fails():
+    async def run():
+        await init_db()
+        upstream = FakeUpstream(total=25)
+        client = make_client(upstream, fav_ids=["42"], refresh_interval=3600)
+        await client.start()
+        try:
+            # start() 已在后台抓取一次，这里同步抓取确保快照已保存
+            assert await client.refresh_snapshots() == 1
+            upstream.failing = True
+            # 上游故障时保留旧快照
+            assert await client.refresh_snapshots() == 0
+            during_outage = await client.get_favorites("42", 2, 20)
+        finally:
+            await client.stop()
+
+        # 重启后从数据库载入快照，上游仍不可用也能返回
+        restarted = make_client(upstream, fav_ids=["42"], refresh_interval=3600)
+        await restarted.start()
+        try:
+            after_restart = await restarted.get_favorites("42", 1, 20)
+        finally:
+            await restarted.stop()
+            await engine.dispose()
+        return during_outage, after_restart
+
+    during_outage, after_restart = asyncio.run(run())
+    assert during_outage["total"] == 25
+    assert [item["id"] for item in during_outage["items"]] == list(range(20, 25))
+    assert len(after_restart["items"]) == 20
@@ -0,0 +1,115 @@
+"""
+media_store 引用计数测试：仍被文章引用或仍在宽限期内的文件不会被删除
+"""
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app import media_store
+from app.database import engine, async_session, init_db
+from app.models import Album, MediaFile, Photo, Post, User
+
+URL = media_store.URL_PREFIX + "0123456789abcdef0123456789abcdef.jpg"
+
+
+def run(coro):
+    async def wrapper():
+        await init_db()
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+    return asyncio.run(wrapper())
+
+
+async def reset(db):
+    for model in (Photo, Album, Post, MediaFile, User):
+        for row in (await db.execute(select(model))).scalars().all():
+            await db.delete(row)
+    await db.commit()
+
+
+def test_release_media_keeps_file_referenced_by_post():
+    async def scenario():
+        async with async_session() as db:
+            await reset(db)
+            user = User(username="media", password_hash="x")
+            album = Album(name="相册")
+            db.add_all([user, album])
+            await db.flush()
+            db.add(MediaFile(sha256="a" * 64, url=URL, size=1, ref_count=1))
+            db.add(Post(title="t", slug="media-post", content=f"![]({URL})", author_id=user.id))
+            photo = Photo(url=URL, album_id=album.id)
+            db.add(photo)
+            await db.commit()
+
+            await db.delete(photo)
+            await db.flush()
+            paths = await media_store.release_media(db, URL)
+            await db.commit()
+            media = (await db.execute(select(MediaFile).where(MediaFile.url == URL))).scalar_one_or_none()
+            return paths, media.ref_count if media else None
+
+    paths, ref_count = run(scenario())
+    assert paths == []
+    assert ref_count == 1
+
+
+def test_release_media_deletes_unreferenced_file():
+    async def scenario():
+        async with async_session() as db:
+            await reset(db)
+            album = Album(name="相册")
+            db.add(album)
+            await db.flush()
+            db.add(MediaFile(sha256="b" * 64, url=URL, size=1, ref_count=1))
+            photo = Photo(url=URL, album_id=album.id)
+            db.add(photo)
+            await db.commit()
+
+            await db.delete(photo)
+            await db.flush()
+            paths = await media_store.release_media(db, URL)
+            await db.commit()
+            return paths
+
+    assert media_store.media_paths(URL)[0] in run(scenario())
+
+
+def test_sweep_keeps_ref_count_of_recent_uploads(monkeypatch):
+    # 不扫描真实的上传目录
+    monkeypatch.setattr(media_store, "find_orphans", lambda referenced, grace_seconds: [])
+    old_url = media_store.URL_PREFIX + "fedcba9876543210fedcba9876543210.png"
+
+    async def scenario():
+        async with async_session() as db:
+            await reset(db)
+            # 刚上传、尚未保存到文章的编辑器图片
+            db.add(MediaFile(sha256="c" * 64, url=URL, size=1, ref_count=1))
+            # 超过宽限期且没有引用
+            db.add(MediaFile(
+                sha256="d" * 64, url=old_url, size=1, ref_count=2,
+                created_at=datetime.utcnow() - timedelta(days=2),
+            ))
+            await db.commit()
+            await media_store.sweep_media(db, dry_run=False, grace_seconds=3600)
+            rows = (await db.execute(select(MediaFile.url, MediaFile.ref_count))).all()
+            return dict(rows)
+
+    counts = run(scenario())
+    assert counts[URL] == 1
+    assert counts[old_url] == 0
+
+
+def test_find_variants_for_referenced_images():
+    variants = [{"url": "/uploads/photos/variants/x_480w.webp", "width": 480, "height": 320, "format": "webp", "size": 1}]
+
+    async def scenario():
+        async with async_session() as db:
+            await reset(db)
+            db.add(MediaFile(sha256="e" * 64, url=URL, size=1, ref_count=1, variants=variants))
+            await db.commit()
+            name = URL.removeprefix(media_store.URL_PREFIX)
+            content = f"![]({URL}) ![](/uploads/resize/480x0/photos/{name}) ![](/uploads/photos/missing.jpg)"
+            return await media_store.find_variants(db, content, None)
+
+    assert run(scenario()) == {URL: variants}
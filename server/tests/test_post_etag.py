@@ -0,0 +1,75 @@
+"""
+文章详情 ETag 测试：浏览量变化不改变 ETag，标签、分类等关联数据变化时 ETag 更新
+"""
+import asyncio
+from sqlalchemy import select, update
+from starlette.requests import Request
+from app.cache import response_cache
+from app.database import engine, async_session, init_db
+from app.models import Category, Post, Tag, User
+from app.routers.posts import get_post
+from app.view_counter import view_counter
+
+SLUG = "etag-post"
+
+
+async def fetch_etag() -> str:
+    async with async_session() as db:
+        request = Request({"type": "http", "method": "GET", "path": f"/api/posts/{SLUG}", "headers": []})
+        response = await get_post(SLUG, request, db=db)
+    return response.headers["etag"]
+
+
+async def seed():
+    async with async_session() as db:
+        if (await db.execute(select(Post).where(Post.slug == SLUG))).scalar_one_or_none():
+            return
+        user = User(username="etag", password_hash="x")
+        category = Category(name="分类", slug="etag-category")
+        tag = Tag(name="标签", slug="etag-tag")
+        db.add_all([user, category, tag])
+        await db.flush()
+        db.add(Post(
+            title="ETag", slug=SLUG, content="正文", is_published=True,
+            author_id=user.id, category_id=category.id, tags=[tag],
+        ))
+        await db.commit()
+
+
+def run(scenario):
+    async def wrapper():
+        await init_db()
+        await seed()
+        try:
+            return await scenario()
+        finally:
+            await engine.dispose()
+    return asyncio.run(wrapper())
+
+
+def test_etag_unchanged_by_views_and_flush():
+    async def scenario():
+        first = await fetch_etag()
+        second = await fetch_etag()
+        await view_counter.flush()
+        # 绕过响应缓存，从数据库重新生成
+        await response_cache.invalidate("posts")
+        third = await fetch_etag()
+        return first, second, third
+
+    first, second, third = run(scenario)
+    assert first == second == third
+
+
+def test_etag_changes_when_tag_renamed():
+    async def scenario():
+        before = await fetch_etag()
+        async with async_session() as db:
+            await db.execute(update(Tag).where(Tag.slug == "etag-tag").values(name="新标签"))
+            await db.commit()
+        await response_cache.invalidate("taxonomy")
+        after = await fetch_etag()
+        return before, after
+
+    before, after = run(scenario)
+    assert before != after
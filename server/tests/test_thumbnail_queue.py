@@ -0,0 +1,38 @@
+"""
+缩略图队列状态测试：失败记录按时间和数量淘汰，删除的照片不再保留状态
+"""
+from app import thumbnail_queue as module
+from app.thumbnail_queue import ThumbnailQueue
+
+
+def test_failed_jobs_expire(monkeypatch):
+    queue = ThumbnailQueue(1, use_processes=False)
+    queue._mark_failed([1, 2])
+    assert queue.status()["failed"] == 2
+
+    monkeypatch.setattr(module, "FAILED_TTL_SECONDS", -1)
+    assert queue.status()["jobs"] == []
+    assert not queue._failed
+
+
+def test_failed_jobs_capped(monkeypatch):
+    monkeypatch.setattr(module, "FAILED_MAX_ENTRIES", 2)
+    queue = ThumbnailQueue(1, use_processes=False)
+    queue._mark_failed([1, 2, 3])
+    assert queue.status()["jobs"] == [
+        {"photo_id": 2, "status": "failed"},
+        {"photo_id": 3, "status": "failed"},
+    ]
+
+
+def test_forget_removes_state_and_pending_work():
+    queue = ThumbnailQueue(1, use_processes=False)
+    queue._mark_failed([1])
+    queue._jobs[2] = "queued"
+    queue._groups["/uploads/photos/a.jpg"] = {"photo_ids": [2, 3], "metadata_only": False, "started": False}
+    queue._jobs[3] = "queued"
+
+    queue.forget([1, 2])
+    assert queue.status()["jobs"] == [{"photo_id": 3, "status": "queued"}]
+    assert queue._groups["/uploads/photos/a.jpg"]["photo_ids"] == [3]
+    assert not queue._failed
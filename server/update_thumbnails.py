@@ -1,4 +1,8 @@
-"""更新数据库中的缩略图路径"""
+"""
+更新数据库中的缩略图路径和响应式版本
+按 generate_thumbnails.py 生成的 manifest 批量写回，不重新生成图片
+等价于 python generate_thumbnails.py --db-only
+"""
 import asyncio
 import os
 import sys
@@ -6,24 +10,8 @@ import sys
 # 添加项目路径
 sys.path.insert(0, os.path.dirname(__file__))
 
-from app.database import async_session
-from app.models import Photo
-from sqlalchemy import select
-
-async def update_thumbnails():
-    async with async_session() as db:
-        result = await db.execute(select(Photo))
-        photos = result.scalars().all()
-        updated = 0
-        for photo in photos:
-            if photo.url and not photo.thumbnail:
-                name = os.path.splitext(os.path.basename(photo.url))[0]
-                thumb_path = f"/uploads/photos/thumbnails/{name}_thumb.jpg"
-                photo.thumbnail = thumb_path
-                updated += 1
-                print(f"  更新: {photo.url} -> {thumb_path}")
-        await db.commit()
-        print(f"\n✅ 更新了 {updated} 张照片的缩略图路径")
+from generate_thumbnails import load_manifest, update_database
 
 if __name__ == "__main__":
-    asyncio.run(update_thumbnails())
+    updated = asyncio.run(update_database(load_manifest()))
+    print(f"\n✅ 更新了 {updated} 张照片的缩略图路径")